@@ -0,0 +1,265 @@
+# Small read-only JSON API over the live standings, for screens that cannot embed the
+# Streamlit page (chatbots, the stage overlay, entity dashboards)
+#
+#   python api_server.py --port 8502                          # standalone, polls the sheet itself
+#   LEADERBOARD_API_PORT=8502 streamlit run leaderboard.py    # inside the app, sharing its pollers
+#
+#   GET /api/events                                   events served by this process
+#   GET /api/standings?event=nlds&mode=Total          per-entity standings of one data mode
+#   GET /api/standings?mode=Total&wait=30             with If-None-Match: long-poll until they change
+#
+# Responses carry a strong ETag derived from the snapshot digest, answer If-None-Match
+# with 304 and are gzip-compressed for clients that accept it.
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from ranking import UNRANKED, rank_entities
+from sheet_schema import DATA_MODES
+
+
+# Longest a long-poll request is held open, in seconds
+MAX_WAIT = 60
+
+# Bodies smaller than this are sent uncompressed
+GZIP_MIN_SIZE = 256
+
+# Name of the threads answering API requests
+THREAD_NAME = 'leaderboard-api'
+
+# Count columns of the combined per-entity frame and their names in the API
+STANDINGS_COLUMNS = {
+    'Total': 'ops_score',
+    'Total_Applied': 'applications',
+    'Total_Approved': 'approvals',
+    'Total_MoUs': 'mous',
+}
+
+
+# A JSON body, its gzip-compressed form and the strong ETag of its contents
+class ApiResponse:
+    def __init__(self, payload, tag):
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.gzip_body = gzip.compress(self.body, mtime=0) if len(self.body) >= GZIP_MIN_SIZE else None
+        self.etag = f'"{tag}"'
+        # A strong ETag names exact bytes, so the compressed variant gets its own
+        self.gzip_etag = f'"{tag}-gz"'
+
+    def matches(self, if_none_match):
+        if if_none_match is None:
+            return False
+        tags = {tag.strip() for tag in if_none_match.split(',')}
+        return '*' in tags or self.etag in tags or self.gzip_etag in tags
+
+
+# Wakes up long-poll requests when an event's poller publishes a new snapshot
+class ChangeNotifier:
+    def __init__(self):
+        self.version = 0
+        self._changed = threading.Condition()
+
+    def notify(self, snapshot=None):
+        with self._changed:
+            self.version += 1
+            self._changed.notify_all()
+
+    # Wait until a snapshot newer than `version` is published; False on timeout
+    def wait(self, version, timeout):
+        with self._changed:
+            return self._changed.wait_for(lambda: self.version != version, timeout)
+
+
+# Standings of one event and data mode, served from the app's own pollers and results cache
+class StandingsApi:
+    def __init__(self, app):
+        # The leaderboard module: it may run as __main__ under `streamlit run`, so it is
+        # passed in rather than imported, which would create a second set of caches
+        self.app = app
+        self._notifiers = {}
+        self._lock = threading.Lock()
+
+    def events(self):
+        events, default_key = self.app.get_events()
+        payload = {
+            'default': default_key,
+            'events': [{'key': event.key, 'title': event.title} for event in events.values()],
+        }
+        return ApiResponse(payload, hashlib.blake2b(json.dumps(payload).encode(), digest_size=16).hexdigest())
+
+    def notifier(self, event_key):
+        with self._lock:
+            notifier = self._notifiers.get(event_key)
+            if notifier is None:
+                notifier = self._notifiers[event_key] = ChangeNotifier()
+                self.app.get_sheet_poller(event_key).add_listener(notifier.notify)
+            return notifier
+
+    # Current standings of one data mode, None while the data has not loaded
+    def standings(self, event_key, data_mode):
+        event = self.app.get_event(event_key)
+        snapshot = self.app.get_sheet_poller(event_key).latest()
+        if snapshot is None:
+            return None
+        results = self.app.leaderboard_results(event, snapshot, data_mode)
+        if results is None:
+            return None
+        key = ('api',) + results['key']
+        return self.app.get_results_cache(event_key).get_or_compute(
+            key, lambda: self.build_standings(event, snapshot, data_mode, results))
+
+    def build_standings(self, event, snapshot, data_mode, results):
+        combined = results['df_combined']
+        # The whole board, ranked like the table but without medals in the names
+        ranked = rank_entities(combined, 'Total', method=self.app.RANK_METHOD)
+        counts = ranked[list(STANDINGS_COLUMNS)].astype('float64').fillna(0).to_numpy()
+        entities = []
+        for rank, entity, values, ratio in zip(ranked['Rank'], combined.loc[ranked.index, 'Entity'].astype(str),
+                                               counts.tolist(), ranked['APL_to_APD'].tolist()):
+            entry = {'rank': None if rank == UNRANKED else int(rank), 'entity': entity}
+            # Counts are whole numbers unless the sheet holds fractions
+            entry.update((name, int(value) if value.is_integer() else value)
+                         for name, value in zip(STANDINGS_COLUMNS.values(), values))
+            entry['applied_to_approved_ratio'] = float(ratio)
+            entities.append(entry)
+
+        payload = {
+            'event': event.key,
+            'mode': data_mode,
+            'digest': snapshot.digest,
+            'fetched_at': snapshot.fetched_at,
+            'totals': {
+                'applications': int(results['total_applied']),
+                'approvals': int(results['total_approved']),
+                'mous': int(results['total_mou']),
+            },
+            'entities': entities,
+        }
+        tag = hashlib.blake2b(repr(results['key']).encode(), digest_size=16).hexdigest()
+        return ApiResponse(payload, tag)
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    api = None
+    server_version = 'LeaderboardAPI'
+
+    def do_GET(self):
+        threading.current_thread().name = THREAD_NAME
+        url = urlsplit(self.path)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        if url.path == '/api/events':
+            self.send_api_response(self.api.events())
+        elif url.path == '/api/standings':
+            self.standings(query)
+        else:
+            self.send_error_json(404, f'Unknown endpoint {url.path}')
+
+    def standings(self, query):
+        events, default_key = self.api.app.get_events()
+        event_key = query.get('event', default_key)
+        data_mode = query.get('mode', 'Total')
+        if event_key not in events:
+            return self.send_error_json(404, f"Unknown event '{event_key}'")
+        if data_mode not in DATA_MODES:
+            return self.send_error_json(400, f"Unknown mode '{data_mode}', expected one of {', '.join(DATA_MODES)}")
+        try:
+            wait = min(float(query.get('wait', 0)), MAX_WAIT)
+        except ValueError:
+            return self.send_error_json(400, 'wait must be a number of seconds')
+
+        notifier = self.api.notifier(event_key)
+        version = notifier.version
+        response = self.api.standings(event_key, data_mode)
+        if response is None:
+            return self.send_error_json(503, f'No {data_mode} standings yet')
+
+        # Long-poll: hold a request for unchanged standings until a new snapshot arrives
+        deadline = time.monotonic() + wait
+        if_none_match = self.headers.get('If-None-Match')
+        while response.matches(if_none_match) and time.monotonic() < deadline:
+            if notifier.wait(version, deadline - time.monotonic()):
+                version = notifier.version
+                response = self.api.standings(event_key, data_mode) or response
+        self.send_api_response(response)
+
+    def send_api_response(self, response):
+        use_gzip = response.gzip_body is not None and 'gzip' in self.headers.get('Accept-Encoding', '')
+        etag = response.gzip_etag if use_gzip else response.etag
+        not_modified = response.matches(self.headers.get('If-None-Match'))
+
+        self.send_response(304 if not_modified else 200)
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        if not_modified:
+            self.end_headers()
+            return
+        body = response.gzip_body if use_gzip else response.body
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        if use_gzip:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message):
+        body = json.dumps({'error': message}).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Streamlit warns about every cached call made outside a script run; the API
+# threads make them on purpose, between the sessions' own runs
+class _ApiThreadFilter(logging.Filter):
+    def filter(self, record):
+        return record.threadName != THREAD_NAME
+
+# HTTP server answering API requests for `app`, the leaderboard module
+def make_server(app, host, port):
+    handler = type('Handler', (ApiRequestHandler,), {'api': StandingsApi(app)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+# Start the API on a daemon thread of the current process
+def serve_in_background(app, port, host='0.0.0.0'):
+    server = make_server(app, host, port)
+    logging.getLogger('streamlit.runtime.scriptrunner_utils.script_run_context').addFilter(_ApiThreadFilter())
+    threading.Thread(target=server.serve_forever, name='leaderboard-api', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the leaderboard standings as a read-only JSON API.')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8502)
+    args = parser.parse_args()
+
+    import streamlit.config
+    import streamlit.logger
+
+    # Running the app's functions outside `streamlit run` logs bare-mode warnings
+    streamlit.config.set_option('logger.level', 'error')
+    streamlit.logger.set_log_level('error')
+
+    import leaderboard
+
+    server = make_server(leaderboard, args.host, args.port)
+    print(f'Serving the leaderboard API on http://{args.host}:{args.port}/api/standings')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
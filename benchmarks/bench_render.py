@@ -0,0 +1,58 @@
+# Benchmark of the leaderboard table HTML: DataFrame.to_html against table_renderer
+#
+#   python benchmarks/bench_render.py
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import table_renderer  # noqa: E402
+from result_cache import LRUCache  # noqa: E402
+
+
+SIZES = [10, 100, 1000]
+DATA_MODE = 'Total'
+
+
+# Ranked table shaped like the one leaderboard_table builds
+def ranked_table(n_entities, seed=0):
+    rng = np.random.default_rng(seed)
+    scores = np.sort(rng.integers(0, 500, n_entities))[::-1]
+    return pd.DataFrame({
+        'Rank': range(1, n_entities + 1),
+        'Entity': [f'Entity {i}' for i in range(n_entities)],
+        f'{DATA_MODE} OPS Score': scores,
+        f'{DATA_MODE} Applications': rng.integers(0, 200, n_entities),
+        f'{DATA_MODE} Approvals': rng.integers(0, 50, n_entities),
+        f'{DATA_MODE} MoUs': rng.integers(0, 20, n_entities),
+    })
+
+
+# Best-of-five time per call, in milliseconds
+def best_ms(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) * 1000 / number
+
+
+def main():
+    print(f"{'entities':>8} {'to_html':>10} {'changed':>10} {'unchanged':>10}  (ms per render)")
+    for n in SIZES:
+        df = ranked_table(n)
+        number = max(1, 2000 // n)
+
+        to_html = best_ms(lambda: df.to_html(classes='dataframe', index=False, escape=False), number)
+        # Changed data: every call renders from scratch
+        changed = best_ms(lambda: table_renderer.build_leaderboard_html(df), number)
+        # Unchanged data: the cached HTML is reused
+        cache = LRUCache(maxsize=1)
+        table_renderer.render_leaderboard_html(df, DATA_MODE, cache)
+        unchanged = best_ms(lambda: table_renderer.render_leaderboard_html(df, DATA_MODE, cache), number)
+
+        print(f'{n:>8} {to_html:>10.3f} {changed:>10.3f} {unchanged:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+# Load test of one leaderboard process: many simulated viewer sessions rerunning main()
+# against a local stand-in for the published Google Sheet
+#
+#   python benchmarks/load_test.py                                  # every scenario, 10/100/300 sessions
+#   python benchmarks/load_test.py --scenarios slow --sessions 200
+#   python benchmarks/load_test.py --interval 10 --duration 60      # compressed autorefresh period
+#
+# Scenarios
+#   unchanged - the sheet never changes (conditional requests answered with 304)
+#   changed   - the sheet changes every --change-every seconds
+#   slow      - unchanged sheet, every upstream response delayed by --slow-delay seconds
+#
+# Sessions are Streamlit AppTest instances of leaderboard.py. AppTest runs are not
+# thread-safe, so one driver thread reruns every session when its autorefresh is
+# due; rerun latency is measured from that due time, so reruns that queue up behind
+# other sessions show up in the percentiles as they would on a busy server. Each
+# (scenario, sessions) run is a separate process, with its own pollers and caches.
+import argparse
+import hashlib
+import heapq
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+APP_PATH = os.path.join(APP_DIR, 'leaderboard.py')
+
+sys.path.insert(0, APP_DIR)
+
+from synthetic import synthetic_csv  # noqa: E402
+
+
+SCENARIOS = ['unchanged', 'changed', 'slow']
+SESSIONS = [10, 100, 300]
+PERCENTILES = [50, 90, 99]
+
+
+# Stand-in for the published sheet: serves synthetic CSV with an ETag, answers
+# If-None-Match with 304 and counts every request
+class SheetStandIn:
+    def __init__(self, rows, change_every=None, delay=0.0):
+        # Two versions of the sheet, alternated when the sheet "changes"
+        self.versions = [synthetic_csv(rows, seed=0), synthetic_csv(rows, seed=1)]
+        self.change_every = change_every
+        self.delay = delay
+        self.requests = 0
+        self.not_modified = 0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stand_in.handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_port}/sheet.csv'
+
+    def current(self):
+        if not self.change_every:
+            return self.versions[0]
+        return self.versions[int((time.monotonic() - self.started) // self.change_every) % 2]
+
+    def handle(self, request):
+        if self.delay:
+            time.sleep(self.delay)
+        body = self.current()
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        with self._lock:
+            self.requests += 1
+            if request.headers.get('If-None-Match') == etag:
+                self.not_modified += 1
+                request.send_response(304)
+                request.send_header('ETag', etag)
+                request.end_headers()
+                return
+        request.send_response(200)
+        request.send_header('Content-Type', 'text/csv')
+        request.send_header('ETag', etag)
+        request.send_header('Content-Length', str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+    def reset_counts(self):
+        with self._lock:
+            self.requests = 0
+            self.not_modified = 0
+
+    def close(self):
+        self.server.shutdown()
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+# Peak resident memory of this process in bytes
+def peak_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+# Run `n_sessions` sessions for `duration` seconds in this process and return the measurements
+def run_sessions(n_sessions, duration, interval):
+    import streamlit.config
+    import streamlit.logger
+
+    # Bare AppTest runs log a warning for every cached call
+    streamlit.config.set_option('logger.level', 'error')
+    streamlit.logger.set_log_level('error')
+
+    from streamlit.testing.v1 import AppTest
+
+    import diagnostics
+
+    rss_start = diagnostics.current_rss()
+    sessions = [AppTest.from_file(APP_PATH, default_timeout=max(60, interval * 2)) for _ in range(n_sessions)]
+
+    first_load_ms = []
+    rerun_ms = []
+    run_ms = []
+    errors = 0
+
+    cpu_start = os.times()
+    start = time.monotonic()
+    end = start + duration
+    # First page loads are spread over the first interval, like viewers arriving
+    due = [(start + interval * i / n_sessions, i, True) for i in range(n_sessions)]
+    heapq.heapify(due)
+    while due and due[0][0] < end:
+        due_at, i, first = heapq.heappop(due)
+        wait = due_at - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+
+        run_start = time.monotonic()
+        at = sessions[i]
+        try:
+            at.run()
+            if at.exception or not any('<table' in m.value for m in at.markdown):
+                errors += 1
+        except Exception:
+            errors += 1
+        done = time.monotonic()
+
+        (first_load_ms if first else rerun_ms).append((done - due_at) * 1000)
+        run_ms.append((done - run_start) * 1000)
+        heapq.heappush(due, (due_at + interval, i, False))
+
+    elapsed = time.monotonic() - start
+    cpu_end = os.times()
+    cpu_seconds = (cpu_end.user - cpu_start.user) + (cpu_end.system - cpu_start.system)
+
+    return {
+        'sessions': n_sessions,
+        'elapsed': elapsed,
+        'reruns': len(rerun_ms),
+        'first_load_ms': {str(q): percentile(first_load_ms, q) for q in PERCENTILES},
+        'rerun_ms': {str(q): percentile(rerun_ms, q) for q in PERCENTILES},
+        'rerun_max_ms': max(rerun_ms) if rerun_ms else None,
+        'run_ms': {str(q): percentile(run_ms, q) for q in PERCENTILES},
+        'errors': errors,
+        'rss_start': rss_start,
+        'peak_rss': peak_rss(),
+        'cpu_seconds': cpu_seconds,
+        # CPU time per session per minute of viewing
+        'cpu_ms_per_session_minute': cpu_seconds * 1000 / n_sessions / (elapsed / 60),
+    }
+
+# One (scenario, sessions) run in a fresh process, so no poller or cache is shared between runs
+def run_worker(url, n_sessions, args):
+    env = dict(os.environ)
+    env.update({
+        'LEADERBOARD_DATA_SOURCE': url,
+        'LEADERBOARD_REFRESH_SECONDS': str(args.refresh),
+        'LEADERBOARD_LIVE_UPDATE': args.live_update,
+    })
+    command = [sys.executable, os.path.abspath(__file__), '--worker', str(n_sessions),
+               '--duration', str(args.duration), '--interval', str(args.interval)]
+    output = subprocess.run(command, env=env, cwd=APP_DIR, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def run_scenario(scenario, args):
+    change_every = args.change_every if scenario == 'changed' else None
+    delay = args.slow_delay if scenario == 'slow' else 0.0
+    stand_in = SheetStandIn(args.rows, change_every=change_every, delay=delay)
+    results = []
+    try:
+        for n_sessions in args.sessions:
+            stand_in.reset_counts()
+            result = run_worker(stand_in.url, n_sessions, args)
+            minutes = result['elapsed'] / 60
+            result.update(
+                scenario=scenario,
+                fetches_per_minute=stand_in.requests / minutes,
+                not_modified_per_minute=stand_in.not_modified / minutes,
+            )
+            results.append(result)
+            print_result(result)
+    finally:
+        stand_in.close()
+    return results
+
+
+def _ms(value):
+    return '-' if value is None else f'{value:.0f}'
+
+def print_header():
+    print(f"{'scenario':>10} {'sessions':>8} {'reruns':>7} {'p50':>7} {'p90':>7} {'p99':>7} {'max':>7} "
+          f"{'run p50':>8} {'first p90':>9} {'fetch/min':>9} {'304/min':>8} {'peak MB':>8} {'MB/sess':>8} "
+          f"{'CPU ms/sess-min':>15} {'errors':>6}")
+
+def print_result(r):
+    mb = 1024 * 1024
+    per_session = ((r['peak_rss'] - r['rss_start']) / r['sessions'] / mb) if r['rss_start'] else None
+    print(f"{r['scenario']:>10} {r['sessions']:>8} {r['reruns']:>7} "
+          f"{_ms(r['rerun_ms']['50']):>7} {_ms(r['rerun_ms']['90']):>7} {_ms(r['rerun_ms']['99']):>7} "
+          f"{_ms(r['rerun_max_ms']):>7} {_ms(r['run_ms']['50']):>8} {_ms(r['first_load_ms']['90']):>9} "
+          f"{r['fetches_per_minute']:>9.1f} {r['not_modified_per_minute']:>8.1f} {r['peak_rss'] / mb:>8.0f} "
+          f"{'-' if per_session is None else f'{per_session:.2f}':>8} "
+          f"{r['cpu_ms_per_session_minute']:>15.1f} {r['errors']:>6}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test leaderboard.py with simulated viewer sessions')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--sessions', type=int, nargs='+', default=SESSIONS, help='concurrent sessions per run')
+    parser.add_argument('--duration', type=float, default=120, help='seconds per run')
+    parser.add_argument('--interval', type=float, default=60, help='seconds between reruns of each session')
+    parser.add_argument('--refresh', type=float, default=5, help='seconds between polls of the sheet')
+    parser.add_argument('--rows', type=int, default=1000, help='rows of the synthetic sheet')
+    parser.add_argument('--change-every', type=float, default=20, help='seconds between changes (changed)')
+    parser.add_argument('--slow-delay', type=float, default=5, help='seconds per upstream response (slow)')
+    parser.add_argument('--live-update', choices=['page', 'fragment'], default='page',
+                        help='LEADERBOARD_LIVE_UPDATE of the app; AppTest always reruns the whole page')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        print(json.dumps(run_sessions(args.worker, args.duration, args.interval)))
+        return 0
+
+    print_header()
+    results = []
+    for scenario in args.scenarios:
+        results += run_scenario(scenario, args)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'args': vars(args), 'results': results},
+                      f, indent=2)
+    return 1 if any(r['errors'] for r in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
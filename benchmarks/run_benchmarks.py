@@ -0,0 +1,185 @@
+# Stage-by-stage benchmark of the leaderboard pipeline on synthetic sheets, no network needed
+#
+#   python benchmarks/run_benchmarks.py --save           # record a baseline on this machine
+#   python benchmarks/run_benchmarks.py                  # compare against benchmarks/baseline.json
+#   python benchmarks/run_benchmarks.py --sizes 10 1000  # only some sheet sizes
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+import streamlit.logger  # noqa: E402
+
+# Importing the app outside `streamlit run` logs bare-mode warnings
+streamlit.logger.set_log_level('error')
+
+import leaderboard  # noqa: E402
+import table_renderer  # noqa: E402
+from data_sources import LocalCsvSource  # noqa: E402
+from sheet_schema import read_sheet_csv  # noqa: E402
+from synthetic import synthetic_csv  # noqa: E402
+
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+# Timings only compare on the machine that recorded them, so the baseline is not checked in
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+
+SIZES = [10, 100, 1000, 10000, 100000]
+DATA_MODE = 'Total'
+
+# Plotly builds one trace per entity (color='Entity'), larger boards are not timed
+FIGURE_MAX_ENTITIES = 500
+
+# A stage is reported as a regression when its best run is this much slower than the
+# baseline's median run and at least REGRESSION_MIN_MS slower in absolute terms, so
+# short stages, where a few milliseconds of scheduling noise is most of the time, do
+# not fire on noise
+REGRESSION_RATIO = 1.5
+REGRESSION_MIN_MS = 5.0
+
+
+# Best and median wall times of `repeat` runs in milliseconds, and the last result
+def time_runs(func, repeat):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        runs.append((time.perf_counter() - start) * 1000)
+    runs.sort()
+    return runs[0], runs[len(runs) // 2], result
+
+# The four per-entity bar charts, built without the figure cache
+def build_figures(df_combined):
+    for y in ('Total_Applied', 'Total_Approved', 'Total_MoUs', 'APL_to_APD'):
+        leaderboard.build_entity_bar_chart(df_combined[['Entity', y]], y, y, y)
+
+# Time every stage of main() for one sheet size
+def bench_size(n_rows, repeat):
+    raw = synthetic_csv(n_rows)
+    timings = {}
+    medians = {}
+
+    # Time one stage and return its result
+    def timed(stage, func):
+        timings[stage], medians[stage], result = time_runs(func, repeat)
+        return result
+
+    # LocalCsvSource.fetch: read, hash and parse the sheet file, as the poller does on a change
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'sheet.csv')
+        with open(path, 'wb') as f:
+            f.write(raw)
+        timed('fetch', LocalCsvSource(path).fetch)
+    # load_data parsing
+    data = timed('parse', lambda: read_sheet_csv(raw))
+    # per-entity aggregations (one grouped pass over every metric and mode)
+    aggregated = timed('aggregate', lambda: leaderboard.aggregate_entity_metrics(data))
+    # combined per-entity frame (the former merge chain)
+    df_combined = timed('combine', lambda: leaderboard.entity_metrics(aggregated, DATA_MODE))
+    # display_score_ranks
+    timed('rank', lambda: leaderboard.display_score_ranks(df_combined))
+    # display_leaderboard_table: rank, rename and order, then HTML without the cache
+    df_table, _ = timed('table', lambda: leaderboard.leaderboard_table(df_combined, DATA_MODE))
+    timed('html', lambda: table_renderer.build_leaderboard_html(df_table))
+    # Plotly figure construction
+    if len(df_combined) <= FIGURE_MAX_ENTITIES:
+        timed('figures', lambda: build_figures(df_combined))
+    else:
+        timings['figures'] = medians['figures'] = None
+
+    return {'rows': n_rows, 'entities': len(df_combined), 'csv_bytes': len(raw), 'ms': timings,
+            'median_ms': medians}
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor() or platform.machine(),
+    }
+
+# Stages that got slower than the baseline, as printable lines
+def regressions(results, baseline, ratio=REGRESSION_RATIO):
+    found = []
+    for size, result in results.items():
+        base = baseline.get('results', {}).get(size)
+        if base is None:
+            continue
+        for stage, ms in result['ms'].items():
+            base_ms = base.get('median_ms', base['ms']).get(stage)
+            if ms is None or base_ms is None:
+                continue
+            if ms > base_ms * ratio and ms - base_ms > REGRESSION_MIN_MS:
+                found.append(f'{size} rows {stage}: {base_ms:.2f} ms -> {ms:.2f} ms ({ms / base_ms:.2f}x)')
+    return found
+
+def print_table(results, baseline):
+    stages = list(next(iter(results.values()))['ms'])
+    print(f"{'rows':>8} " + ' '.join(f'{stage:>10}' for stage in stages) + '  (ms)')
+    for size, result in results.items():
+        cells = []
+        for stage in stages:
+            ms = result['ms'][stage]
+            cells.append(f"{'-' if ms is None else f'{ms:.2f}':>10}")
+        print(f'{size:>8} ' + ' '.join(cells))
+        base = baseline.get('results', {}).get(size) if baseline else None
+        if base is not None:
+            base_cells = []
+            for stage in stages:
+                ms = base['ms'].get(stage)
+                base_cells.append(f"{'-' if ms is None else f'{ms:.2f}':>10}")
+            print(f"{'baseline':>8} " + ' '.join(base_cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the leaderboard pipeline stage by stage')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='sheet sizes in rows')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_RATIO,
+                        help='slowdown ratio reported as a regression')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = {}
+    for size in args.sizes:
+        results[str(size)] = bench_size(size, args.repeat)
+    report = {'environment': environment(), 'repeat': args.repeat, 'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results}
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if (baseline.get('environment'), baseline.get('repeat')) != (report['environment'], args.repeat):
+            print(f'Baseline {args.baseline} was recorded on another setup or with another --repeat, '
+                  'record one for this run with --save')
+            baseline = None
+
+    print_table(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Baseline written to {args.baseline}')
+        return 0
+
+    if baseline is not None:
+        found = regressions(results, baseline, args.tolerance)
+        for line in found:
+            print(f'REGRESSION {line}')
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
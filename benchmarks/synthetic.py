@@ -0,0 +1,68 @@
+# Synthetic leaderboard sheets for benchmarks and offline runs
+#
+#   python benchmarks/synthetic.py --rows 10000 -o sheet.csv
+import argparse
+import math
+
+import numpy as np
+import pandas as pd
+
+
+FUNCTIONS = ['oGV', 'iGV', 'oGTa', 'iGTa', 'oGTe', 'iGTe']
+
+# Points per approval / application / MoU used to fill the '{mode} Total' OPS score
+SCORE_WEIGHTS = {'Applied': 2, 'Approved': 5, 'MoUs': 3}
+
+
+# A sheet with one row per Entity x Function and both the Total and Daily column families
+def synthetic_sheet(n_rows, functions=FUNCTIONS, seed=0):
+    rng = np.random.default_rng(seed)
+    n_entities = max(1, math.ceil(n_rows / len(functions)))
+    entities = np.repeat([f'Entity {i:05d}' for i in range(n_entities)], len(functions))[:n_rows]
+    function = np.tile(functions, n_entities)[:n_rows]
+
+    sheet = {'Entity': entities, 'Function': function}
+    # Daily numbers are a slice of the running totals
+    totals = {
+        'SUs': rng.poisson(25, n_rows),
+        'Applied': rng.poisson(12, n_rows),
+        'MoUs': rng.poisson(2, n_rows),
+    }
+    totals['Approved'] = rng.binomial(totals['Applied'], 0.35)
+    daily = {metric: rng.binomial(values, 0.2) for metric, values in totals.items()}
+
+    for mode, counts in (('Total', totals), ('Daily', daily)):
+        for metric in ('SUs', 'Applied', 'Approved', 'MoUs'):
+            sheet[f'{mode} {metric}'] = counts[metric]
+        sheet[f'{mode} Total'] = sum(counts[metric] * weight for metric, weight in SCORE_WEIGHTS.items())
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.round(counts['Approved'] * 100 / counts['Applied'], 2)
+        sheet[f'{mode} %APL-APD'] = np.where(np.isfinite(ratio), ratio, 0)
+
+    # Columns the published sheet carries but the leaderboard never reads
+    sheet['Last Updated'] = '27/04/2025 20:00:00'
+    sheet['Notes'] = ''
+    return pd.DataFrame(sheet)
+
+# The sheet as the CSV bytes Google Sheets would publish
+def synthetic_csv(n_rows, seed=0):
+    return synthetic_sheet(n_rows, seed=seed).to_csv(index=False).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a synthetic leaderboard sheet as CSV')
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', default='-')
+    args = parser.parse_args()
+
+    raw = synthetic_csv(args.rows, args.seed)
+    if args.output == '-':
+        print(raw.decode(), end='')
+    else:
+        with open(args.output, 'wb') as f:
+            f.write(raw)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+import threading
+from collections import deque
+
+import numpy as np
+
+from ranking import score_order, sorted_ranks
+
+
+# Per-entity aggregates compared between snapshots, in the order they are stored
+FEED_METRICS = ['Total', 'Total_Applied', 'Total_Approved', 'Total_MoUs']
+
+# Rank stored for entities that have not scored yet
+_UNRANKED = 0
+
+
+# What changed on the board between two versions of the feed. Empty (falsy) when
+# no entity's aggregates moved, so consumers can skip their work entirely.
+class ChangeSet:
+    def __init__(self, version, taken_at=None, deltas=None, rank_changes=None):
+        self.version = version
+        self.taken_at = taken_at
+        # {entity: change of every FEED_METRICS column}, only for entities that moved
+        self.deltas = deltas or {}
+        # {entity: (old rank, new rank)}, None for an unranked entity
+        self.rank_changes = rank_changes or {}
+
+    def __bool__(self):
+        return bool(self.deltas)
+
+    # (entity, number of new approvals) of every entity with new approvals
+    def approvals(self):
+        column = FEED_METRICS.index('Total_Approved')
+        return [(entity, delta[column]) for entity, delta in self.deltas.items() if delta[column] > 0]
+
+
+# Keeps the previous per-entity aggregate vectors of one event and turns every new
+# snapshot into a ChangeSet. Snapshots are compared in one vectorised pass; only the
+# entities that moved are converted to Python objects, and ranks are only
+# recomputed when a score moved.
+class ChangeFeed:
+    def __init__(self, max_changes=100, rank_method='min'):
+        self.rank_method = rank_method
+        # Bumped on every non-empty change set
+        self.version = 0
+        self._entities = None
+        self._values = None
+        self._ranks = None
+        self._changes = deque(maxlen=max_changes)
+        self._lock = threading.Lock()
+
+    # Compare a snapshot's per-entity totals (a frame indexed by Entity) with the
+    # previous ones and return the change set; the first call only sets the baseline
+    def update(self, taken_at, totals):
+        entities = totals.index.astype(str)
+        values = totals.reindex(columns=FEED_METRICS).to_numpy(dtype='float64', na_value=0)
+
+        with self._lock:
+            if self._values is None:
+                self._store(entities, values, self._rank(values))
+                return ChangeSet(self.version, taken_at)
+
+            if entities.equals(self._entities):
+                previous, previous_ranks = self._values, self._ranks
+            else:
+                # Entities added to the sheet start from zero; removed ones are dropped
+                positions = self._entities.get_indexer(entities)
+                known = positions >= 0
+                previous = np.zeros_like(values)
+                previous[known] = self._values[positions[known]]
+                previous_ranks = np.full(len(entities), _UNRANKED, dtype=np.int64)
+                previous_ranks[known] = self._ranks[positions[known]]
+
+            changed = np.flatnonzero((values != previous).any(axis=1))
+            if len(changed) == 0:
+                self._store(entities, values, previous_ranks)
+                return ChangeSet(self.version, taken_at)
+
+            ranks = previous_ranks
+            if (values[changed, 0] != previous[changed, 0]).any():
+                ranks = self._rank(values)
+            self._store(entities, values, ranks)
+
+            moved_rank = np.flatnonzero(ranks != previous_ranks)
+            self.version += 1
+            changes = ChangeSet(
+                self.version, taken_at,
+                deltas=dict(zip(entities[changed], (values[changed] - previous[changed]).tolist())),
+                rank_changes={entities[i]: (_rank_or_none(previous_ranks[i]), _rank_or_none(ranks[i]))
+                              for i in moved_rank},
+            )
+            self._changes.append(changes)
+            return changes
+
+    def _store(self, entities, values, ranks):
+        self._entities = entities
+        self._values = values
+        self._ranks = ranks
+
+    def _rank(self, values):
+        scores = values[:, 0]
+        order = score_order(scores)
+        ranks = np.empty(len(scores), dtype=np.int64)
+        ranks[order] = sorted_ranks(scores[order], self.rank_method)
+        ranks[scores == 0] = _UNRANKED
+        return ranks
+
+    # Everything that changed after `version`, merged into one change set
+    def since(self, version):
+        if version >= self.version:
+            return ChangeSet(self.version)
+        with self._lock:
+            newer = [changes for changes in self._changes if changes.version > version]
+            current = self.version
+        deltas = {}
+        rank_changes = {}
+        for changes in newer:
+            for entity, delta in changes.deltas.items():
+                total = deltas.get(entity)
+                deltas[entity] = delta if total is None else [a + b for a, b in zip(total, delta)]
+            for entity, (old, new) in changes.rank_changes.items():
+                rank_changes[entity] = (rank_changes.get(entity, (old, None))[0], new)
+        rank_changes = {entity: ranks for entity, ranks in rank_changes.items() if ranks[0] != ranks[1]}
+        return ChangeSet(current, newer[-1].taken_at if newer else None, deltas, rank_changes)
+
+    # Latest (time, entity, approvals) entries, newest first
+    def recent_approvals(self, limit=5):
+        with self._lock:
+            changes = list(self._changes)
+        recent = []
+        for change_set in reversed(changes):
+            for entity, count in change_set.approvals():
+                recent.append((change_set.taken_at, entity, count))
+                if len(recent) == limit:
+                    return recent
+        return recent
+
+
+def _rank_or_none(rank):
+    return None if rank == _UNRANKED else int(rank)
@@ -0,0 +1,192 @@
+import hashlib
+import os
+import sqlite3
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import pandas as pd
+
+from sheet_schema import conform_frame, read_sheet_csv, validate_columns
+
+
+# Seconds to wait on Google Sheets before giving up on a single fetch
+FETCH_TIMEOUT = 30
+
+
+# Data read from a source: the parsed frame, a digest of its contents and the
+# change token the source uses to tell whether it has changed since
+class SourceData:
+    def __init__(self, data, digest, token=None):
+        self.data = data
+        self.digest = digest
+        self.token = token
+
+
+# A place the leaderboard data is read from. `fetch(token)` returns None when the data
+# behind `token` (from the previous SourceData) is unchanged, so it is never re-parsed.
+class DataSource:
+    # Whether the data carries Daily columns without a snapshot history
+    has_daily = False
+
+    def fetch(self, token=None):
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.location!r})'
+
+
+# Digest of a parsed frame, for sources that do not hand us raw bytes
+def frame_digest(df):
+    hashed = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    header = '\x1f'.join(map(str, df.columns)).encode()
+    return hashlib.sha256(header + hashed.tobytes()).hexdigest()
+
+# Size and modification time of a file (and its SQLite WAL, if any) as a change token
+def file_token(path, *extra_paths):
+    token = []
+    for p in (path,) + extra_paths:
+        if os.path.exists(p):
+            stat = os.stat(p)
+            token.append((stat.st_mtime_ns, stat.st_size))
+        else:
+            token.append(None)
+    return tuple(token)
+
+
+# The sheet published to the web as CSV, fetched with conditional requests (ETag/Last-Modified)
+class PublishedCsvSource(DataSource):
+    def __init__(self, url):
+        self.location = url
+
+    def fetch(self, token=None):
+        etag, last_modified, previous_digest = token or (None, None, None)
+        request = urllib.request.Request(self.location)
+        if etag:
+            request.add_header('If-None-Match', etag)
+        if last_modified:
+            request.add_header('If-Modified-Since', last_modified)
+
+        try:
+            with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT) as response:
+                raw = response.read()
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return None
+            raise
+
+        # Servers that ignore the conditional headers still send identical bytes
+        digest = hashlib.sha256(raw).hexdigest()
+        if digest == previous_digest:
+            return None
+        return SourceData(read_sheet_csv(raw), digest, (etag, last_modified, digest))
+
+
+# A CSV export on local disk, re-read only when its size or mtime changes
+class LocalCsvSource(DataSource):
+    def __init__(self, path):
+        self.location = path
+
+    def fetch(self, token=None):
+        stat_token = file_token(self.location)
+        if token is not None and token[0] == stat_token:
+            return None
+        with open(self.location, 'rb') as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        if token is not None and token[1] == digest:
+            return None
+        return SourceData(read_sheet_csv(raw), digest, (stat_token, digest))
+
+
+# A columnar file (Parquet, or Arrow IPC/Feather) read through a memory map,
+# only the schema's columns are materialised
+class ColumnarFileSource(DataSource):
+    def __init__(self, path):
+        self.location = path
+
+    def _read_table(self, columns):
+        import pyarrow as pa
+        if self.location.endswith(('.parquet', '.pq')):
+            import pyarrow.parquet as pq
+            return pq.read_table(self.location, columns=columns, memory_map=True)
+        with pa.memory_map(self.location) as source:
+            return pa.ipc.open_file(source).read_all().select(columns)
+
+    def _column_names(self):
+        import pyarrow as pa
+        if self.location.endswith(('.parquet', '.pq')):
+            import pyarrow.parquet as pq
+            return pq.read_schema(self.location, memory_map=True).names
+        with pa.memory_map(self.location) as source:
+            return pa.ipc.open_file(source).schema.names
+
+    def fetch(self, token=None):
+        stat_token = file_token(self.location)
+        if token == stat_token:
+            return None
+        columns = validate_columns(self._column_names())
+        data = conform_frame(self._read_table(columns).to_pandas())
+        return SourceData(data, frame_digest(data), stat_token)
+
+
+# A table in a SQLite database, re-read only after another connection commits to it
+class SqliteSource(DataSource):
+    def __init__(self, path, table):
+        self.location = f'{path}#{table}'
+        self.path = path
+        self.table = table
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        return self._connection
+
+    def fetch(self, token=None):
+        connection = self._connect()
+        # data_version changes whenever another connection commits to the database
+        version = connection.execute('PRAGMA data_version').fetchone()[0]
+        change_token = (version, file_token(self.path, self.path + '-wal'))
+        if token == change_token:
+            return None
+
+        table = '"' + self.table.replace('"', '""') + '"'
+        header = [row[1] for row in connection.execute(f'PRAGMA table_info({table})')]
+        columns = validate_columns(header)
+        select = ', '.join('"' + col.replace('"', '""') + '"' for col in columns)
+        data = conform_frame(pd.read_sql_query(f'SELECT {select} FROM {table}', connection))
+        return SourceData(data, frame_digest(data), change_token)
+
+
+# Pick the backend for a data source setting:
+#   https://...                        published CSV (Google Sheets)
+#   /path/sheet.csv or file:///...     local CSV
+#   /path/sheet.parquet, .arrow, ...   memory-mapped columnar file
+#   sqlite:///board.db?table=t         SQLite table, path relative to the working directory
+#   sqlite:////abs/board.db?table=t    SQLite table at an absolute path (also /abs/board.db#t)
+#   records:///path/export.csv         raw per-record export, aggregated here (see raw_records)
+# `day_start()` returns the start of the Daily window for sources that compute Daily numbers
+def open_data_source(spec, day_start=None):
+    parsed = urllib.parse.urlparse(spec)
+    if parsed.scheme in ('http', 'https'):
+        return PublishedCsvSource(spec)
+
+    if parsed.scheme == 'records':
+        from raw_records import RawRecordsSource
+        return RawRecordsSource(urllib.parse.unquote(parsed.netloc + parsed.path), day_start)
+
+    if parsed.scheme == 'sqlite':
+        table = urllib.parse.parse_qs(parsed.query).get('table', ['leaderboard'])[0]
+        # sqlite:///relative.db and sqlite:////absolute.db, as in SQLAlchemy URLs
+        return SqliteSource(urllib.parse.unquote(parsed.path[1:]), table)
+
+    path = urllib.parse.unquote(parsed.path) if parsed.scheme == 'file' else spec
+    path, _, table = path.partition('#')
+    if path.endswith(('.db', '.sqlite', '.sqlite3')):
+        return SqliteSource(path, table or 'leaderboard')
+    if path.endswith(('.parquet', '.pq', '.arrow', '.feather', '.ipc')):
+        return ColumnarFileSource(path)
+    return LocalCsvSource(path)
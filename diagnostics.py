@@ -0,0 +1,142 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+# Record every session's stages, not only sessions that opened ?diagnostics
+ALWAYS_ON = os.environ.get('LEADERBOARD_DIAGNOSTICS') == '1'
+
+# Number of recent stage records kept in memory
+BUFFER_SIZE = int(os.environ.get('LEADERBOARD_DIAGNOSTICS_BUFFER', 2000))
+
+# Recent stage records, oldest dropped first
+records = deque(maxlen=BUFFER_SIZE)
+
+# Cumulative per-stage (count, seconds) and per-event counts since the process started
+_stage_totals = {}
+_event_totals = {}
+_totals_lock = threading.Lock()
+
+# Whether the script run on the current thread is being instrumented
+_local = threading.local()
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def set_enabled(enabled):
+    _local.enabled = enabled
+
+def enabled():
+    return ALWAYS_ON or getattr(_local, 'enabled', False)
+
+# Resident set size of this process in bytes, None where /proc is not available
+def current_rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+# Add one record to the ring buffer and the cumulative totals
+def record(stage, seconds, memory_delta=None, **labels):
+    entry = {'time': time.time(), 'stage': stage, 'ms': round(seconds * 1000, 3)}
+    if memory_delta is not None:
+        entry['memory_delta'] = memory_delta
+    entry.update(labels)
+    records.append(entry)
+    with _totals_lock:
+        count, total = _stage_totals.get(stage, (0, 0.0))
+        _stage_totals[stage] = (count + 1, total + seconds)
+
+# Count a point event such as a cache hit or miss
+def event(name, **labels):
+    if not enabled():
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _totals_lock:
+        _event_totals[key] = _event_totals.get(key, 0) + 1
+    records.append({'time': time.time(), 'stage': name, 'ms': 0.0, **labels})
+
+
+# Times the wrapped block and records it with the RSS change
+class _Stage:
+    __slots__ = ('name', 'labels', 'start', 'rss')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.rss = current_rss()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        rss = current_rss()
+        delta = rss - self.rss if rss is not None and self.rss is not None else None
+        record(self.name, seconds, delta, **self.labels)
+        return False
+
+
+# Shared do-nothing block used while diagnostics are off
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_STAGE = _NoStage()
+
+
+# `with stage('aggregate'):` records the block's wall time and memory delta;
+# costs one flag check when diagnostics are off
+def stage(name, **labels):
+    if not enabled():
+        return _NO_STAGE
+    return _Stage(name, labels)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+# Cumulative totals in the Prometheus text exposition format
+def prometheus_text():
+    with _totals_lock:
+        stage_totals = dict(_stage_totals)
+        event_totals = dict(_event_totals)
+
+    lines = [
+        '# HELP leaderboard_stage_seconds Wall time spent in each leaderboard stage.',
+        '# TYPE leaderboard_stage_seconds summary',
+    ]
+    for stage_name, (count, total) in sorted(stage_totals.items()):
+        lines.append(f'leaderboard_stage_seconds_count{{stage="{_label(stage_name)}"}} {count}')
+        lines.append(f'leaderboard_stage_seconds_sum{{stage="{_label(stage_name)}"}} {total:.6f}')
+
+    lines += [
+        '# HELP leaderboard_events_total Point events such as cache hits and misses.',
+        '# TYPE leaderboard_events_total counter',
+    ]
+    for (name, labels), count in sorted(event_totals.items()):
+        label_text = ','.join([f'event="{_label(name)}"'] + [f'{k}="{_label(v)}"' for k, v in labels])
+        lines.append(f'leaderboard_events_total{{{label_text}}} {count}')
+
+    rss = current_rss()
+    if rss is not None:
+        lines += [
+            '# HELP leaderboard_resident_memory_bytes Resident memory of the server process.',
+            '# TYPE leaderboard_resident_memory_bytes gauge',
+            f'leaderboard_resident_memory_bytes {rss}',
+        ]
+    return '\n'.join(lines) + '\n'
+
+# Recent records as JSON lines, oldest first
+def jsonl_text():
+    return ''.join(json.dumps(entry) + '\n' for entry in list(records))
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+from sheet_schema import DATA_MODES, METRIC_DTYPES
+
+
+# Metrics kept per (Entity, Function) cell, by sheet column suffix ('{data_mode} {metric}')
+CUBE_METRICS = list(METRIC_DTYPES)
+
+
+# Sums of every metric in every data mode per (Entity, Function), built in one pass
+# over the sheet. Axes are entity x function x metric x data mode, so any function,
+# per-function total or cross-function rollup is a slice of the same array.
+class EntityFunctionCube:
+    def __init__(self, entities, functions, values, present):
+        self.entities = entities
+        self.functions = functions
+        self.values = values
+        # True for the (Entity, Function) pairs that have at least one row in the sheet
+        self.present = present
+
+    @classmethod
+    def from_frame(cls, df):
+        entity_codes, entities = pd.factorize(df['Entity'])
+        function_codes, functions = pd.factorize(df['Function'])
+        shape = (len(entities), len(functions))
+
+        # Rows without an Entity or Function are left out, as groupby does
+        valid = (entity_codes >= 0) & (function_codes >= 0)
+        cells = np.ravel_multi_index((entity_codes[valid], function_codes[valid]), shape)
+        size = shape[0] * shape[1]
+
+        # Metrics missing from the sheet (e.g. no Daily columns) stay NaN
+        values = np.full(shape + (len(CUBE_METRICS), len(DATA_MODES)), np.nan)
+        for m, metric in enumerate(CUBE_METRICS):
+            for d, mode in enumerate(DATA_MODES):
+                col = f'{mode} {metric}'
+                if col in df.columns:
+                    weights = df[col].to_numpy(dtype='float64', na_value=0)[valid]
+                    values[:, :, m, d] = np.bincount(cells, weights=weights, minlength=size).reshape(shape)
+
+        present = np.bincount(cells, minlength=size).reshape(shape) > 0
+        return cls(pd.Index(entities, name='Entity'), pd.Index(functions, name='Function'), values, present)
+
+    def has(self, metric, data_mode):
+        if len(self.entities) == 0 or len(self.functions) == 0:
+            return False
+        return not np.isnan(self.values[0, 0, CUBE_METRICS.index(metric), DATA_MODES.index(data_mode)])
+
+    def _plane(self, metric, data_mode):
+        return self.values[:, :, CUBE_METRICS.index(metric), DATA_MODES.index(data_mode)]
+
+    # Per-entity sums of one metric for `function`, or summed across every function
+    # when function is None; only entities with rows for that function are included
+    def by_entity(self, metric, data_mode, function=None):
+        plane = self._plane(metric, data_mode)
+        if function is None:
+            values = plane.sum(axis=1)
+            keep = self.present.any(axis=1)
+        else:
+            f = self.functions.get_loc(function)
+            values = plane[:, f]
+            keep = self.present[:, f]
+        return _counts(pd.Series(values[keep], index=self.entities[keep], name=metric))
+
+    # Sums of one metric per function across every entity
+    def by_function(self, metric, data_mode):
+        return _counts(pd.Series(self._plane(metric, data_mode).sum(axis=0), index=self.functions, name=metric))
+
+
+# Show whole counts as integers again, the cube itself holds floats
+def _counts(series):
+    if METRIC_DTYPES[series.name] == 'Int32' and (series % 1 == 0).all():
+        return series.astype('int64')
+    return series
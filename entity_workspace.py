@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+from entity_cube import CUBE_METRICS
+from events import entity_slug
+from ranking import rank_entities
+from sheet_schema import DATA_MODES
+from table_renderer import build_leaderboard_html
+
+
+# Per-function columns of a workspace page: sheet metric -> column title
+WORKSPACE_FUNCTION_COLUMNS = {
+    'Total': 'OPS Score',
+    'Applied': 'Applications',
+    'Approved': 'Approvals',
+    'MoUs': 'MoUs',
+    'SUs': 'Sign Ups',
+}
+
+
+# Everything one entity's page shows for one snapshot and data mode, built with the
+# national board so a page view is a dictionary lookup
+class EntityWorkspace:
+    def __init__(self, entity, rank, numbers, above=None, below=None, functions_html=None):
+        self.entity = entity
+        self.slug = entity_slug(entity)
+        # Rank number, or UNRANKED before the entity has scored
+        self.rank = rank
+        # {'Total': ..., 'Total_Applied': ..., 'Total_Approved': ..., 'Total_MoUs': ..., 'APL_to_APD': ...}
+        self.numbers = numbers
+        # (entity, rank, points between the two) of the neighbours on the board, None at either end
+        self.above = above
+        self.below = below
+        # Per-function numbers as a rendered table, None when the sheet has no Function column
+        self.functions_html = functions_html
+
+
+# Workspaces of every entity, keyed by entity_slug(), from the combined per-entity
+# frame of one data mode and (optionally) the Entity x Function cube of the snapshot
+def build_entity_workspaces(df_combined, data_mode, cube=None, rank_method='min'):
+    ranked = rank_entities(df_combined, 'Total', method=rank_method)
+    names = df_combined.loc[ranked.index, 'Entity'].astype(str).tolist()
+    scores = ranked['Total'].to_numpy(dtype='float64', na_value=0)
+    ranks = ranked['Rank'].tolist()
+    numbers = ranked[['Total', 'Total_Applied', 'Total_Approved', 'Total_MoUs', 'APL_to_APD']].to_dict('records')
+
+    functions = _function_tables(cube, data_mode) if cube is not None else {}
+
+    workspaces = {}
+    for position, entity in enumerate(names):
+        above = below = None
+        if position > 0:
+            above = (names[position - 1], ranks[position - 1], scores[position - 1] - scores[position])
+        if position + 1 < len(names):
+            below = (names[position + 1], ranks[position + 1], scores[position] - scores[position + 1])
+        workspace = EntityWorkspace(entity, ranks[position], numbers[position], above, below,
+                                    functions.get(entity))
+        workspaces[workspace.slug] = workspace
+    return workspaces
+
+# Rendered per-function table of every entity, sliced out of the cube in one go
+def _function_tables(cube, data_mode):
+    if not cube.has('Total', data_mode):
+        return {}
+    metrics = [CUBE_METRICS.index(metric) for metric in WORKSPACE_FUNCTION_COLUMNS]
+    values = cube.values[:, :, metrics, DATA_MODES.index(data_mode)]
+    whole = np.all(np.nan_to_num(values) % 1 == 0, axis=(0, 1))
+
+    tables = {}
+    for e, entity in enumerate(cube.entities.astype(str)):
+        present = cube.present[e]
+        frame = pd.DataFrame(np.nan_to_num(values[e, present]), columns=list(WORKSPACE_FUNCTION_COLUMNS.values()))
+        for col, is_whole in zip(frame.columns, whole):
+            if is_whole:
+                frame[col] = frame[col].astype('int64')
+        frame.insert(0, 'Function', cube.functions[present].astype(str))
+        tables[entity] = build_leaderboard_html(frame.sort_values('OPS Score', ascending=False, kind='stable'))
+    return tables
@@ -0,0 +1,76 @@
+import json
+import os
+
+
+# JSON file listing the events served by this process; unset serves the single built-in event
+EVENTS_CONFIG = os.environ.get('LEADERBOARD_EVENTS')
+
+# Settings an event in the config file may set
+EVENT_FIELDS = ('title', 'source', 'title_image', 'mascot_image', 'banners', 'snapshot_db',
+                'refresh_seconds', 'cache_mb', 'scoring')
+
+
+class EventConfigError(ValueError):
+    pass
+
+
+# One leaderboard (NLDS, NatCon, the exchange marathon, ...): where its data comes
+# from, how it looks and how much it may keep in memory
+class EventConfig:
+    def __init__(self, key, title, source, title_image=None, mascot_image=None, banners=None,
+                 snapshot_db=None, refresh_seconds=5, cache_mb=64, scoring=None):
+        self.key = key
+        self.title = title
+        self.source = source
+        self.title_image = title_image
+        self.mascot_image = mascot_image
+        # Entity workspace banners, keyed by entity_slug() of the entity name
+        self.banners = {entity_slug(entity): url for entity, url in (banners or {}).items()}
+        self.snapshot_db = snapshot_db
+        self.refresh_seconds = float(refresh_seconds)
+        # Memory budget of the event's derived results, in megabytes
+        self.cache_mb = float(cache_mb)
+        # Scoring weights (a JSON file path or the config itself), None to use the sheet's Total columns
+        self.scoring = scoring
+
+
+# Entity names as used to look up banners: 'CC x CN' and 'ccxcn' are the same entity
+def entity_slug(entity):
+    return ''.join(ch for ch in str(entity).lower() if ch.isalnum())
+
+# Read the events config file:
+#   {"default": "nlds",
+#    "events": [{"key": "nlds", "title": "NLDS2025 Hackathon", "source": "https://...", ...}, ...]}
+# Settings an event leaves out are taken from `defaults`. Returns ({key: EventConfig}, default key).
+def load_events(path, defaults=None):
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+
+    entries = config.get('events') if isinstance(config, dict) else config
+    if not entries:
+        raise EventConfigError(f'No events in {path}')
+
+    events = {}
+    for entry in entries:
+        key = entry.get('key')
+        if not key:
+            raise EventConfigError(f'Event without a key in {path}')
+        if key in events:
+            raise EventConfigError(f"Event '{key}' is listed twice in {path}")
+        unknown = set(entry) - set(EVENT_FIELDS) - {'key'}
+        if unknown:
+            raise EventConfigError(f"Unknown settings for event '{key}': {', '.join(sorted(unknown))}")
+
+        settings = dict(defaults or {})
+        settings.update(entry)
+        settings.setdefault('title', key)
+        if not settings.get('source'):
+            raise EventConfigError(f"Event '{key}' has no data source")
+        events[key] = EventConfig(**settings)
+
+    default_key = config.get('default') if isinstance(config, dict) else None
+    if default_key is None:
+        default_key = next(iter(events))
+    elif default_key not in events:
+        raise EventConfigError(f"Default event '{default_key}' is not listed in {path}")
+    return events, default_key
@@ -0,0 +1,176 @@
+# Headless export of the leaderboard as a static HTML page and a JSON file, so any
+# static file server or CDN can serve the board instead of one live Streamlit session
+# per viewer. Files are replaced atomically and only when the numbers change.
+#
+#   python export_static.py public/                   # keep public/ up to date
+#   python export_static.py public/ --event natcon    # one event of LEADERBOARD_EVENTS
+#   python export_static.py public/ --once            # write once and exit
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from html import escape
+
+import pytz
+import streamlit.config
+import streamlit.logger
+
+# Running the app's functions outside `streamlit run` logs bare-mode warnings.
+# The level is also set in the config, which Streamlit reloads on first use.
+streamlit.config.set_option('logger.level', 'error')
+streamlit.logger.set_log_level('error')
+
+import leaderboard  # noqa: E402
+from file_utils import atomic_write  # noqa: E402
+from sheet_schema import DATA_MODES  # noqa: E402
+from table_renderer import LEADERBOARD_TABLE_CSS  # noqa: E402
+
+
+HTML_FILE = 'index.html'
+JSON_FILE = 'leaderboard.json'
+
+# Page layout around the app's own table styling
+PAGE_CSS = """
+    <style>
+    body {
+        font-family: "Source Sans Pro", sans-serif;
+        color: #31333F;
+        max-width: 1400px;
+        margin: 0 auto;
+        padding: 1rem;
+    }
+    .summary {
+        display: flex;
+        gap: 1rem;
+    }
+    .summary > div {
+        flex: 1;
+    }
+</style>
+"""
+
+
+# JSON cannot hold numpy scalars, convert them to Python numbers
+def _json_value(value):
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+# The numbers and table rows of every data mode with results, in a JSON-ready dict
+def leaderboard_payload(event, snapshot):
+    modes = {}
+    for data_mode in DATA_MODES:
+        results = leaderboard.leaderboard_results(event, snapshot, data_mode)
+        if results is None or results['df_table'] is None:
+            continue
+        modes[data_mode] = {
+            'total_applied': results['total_applied'],
+            'total_approved': results['total_approved'],
+            'total_mou': results['total_mou'],
+            'rows': results['df_table'].to_dict('records'),
+        }
+    return {'event': event.key, 'title': event.title, 'digest': snapshot.digest, 'modes': modes}
+
+# Self-contained page with the summary numbers and the leaderboard table of every data mode
+def leaderboard_page(event, snapshot, updated_at):
+    sections = []
+    for data_mode in DATA_MODES:
+        results = leaderboard.leaderboard_results(event, snapshot, data_mode)
+        if results is None or results['html_table'] is None:
+            continue
+        summary = ''.join([
+            leaderboard.summary_number_html(f'🌍 {data_mode} Applications', results['total_applied']),
+            leaderboard.summary_number_html(f'✅ {data_mode} Approvals', results['total_approved']),
+            leaderboard.summary_number_html(f'📊 {data_mode} MoUs', results['total_mou']),
+        ])
+        sections.append(
+            f"<section>\n<div class='summary'>{summary}</div>\n<hr>\n"
+            f"<h2>🔥{data_mode} Leaderboard</h2>\n{results['html_table']}\n</section>\n")
+
+    head = (
+        '<meta charset="utf-8">\n'
+        '<meta name="viewport" content="width=device-width, initial-scale=1">\n'
+        # Viewers pick up new files on the same schedule as the live app
+        f'<meta http-equiv="refresh" content="{leaderboard.LIVE_UPDATE_INTERVAL}">\n'
+        f'<title>{escape(event.title)}</title>\n'
+    )
+    if event.mascot_image:
+        head += f'<link rel="icon" href="{escape(event.mascot_image)}">\n'
+    title_image = (f'<img src="{escape(event.title_image)}" alt="{escape(event.title)}" style="width: 100%;">\n'
+                   if event.title_image else f'<h1>{escape(event.title)}</h1>\n')
+
+    return (
+        '<!DOCTYPE html>\n<html lang="en">\n<head>\n'
+        f'{head}{LEADERBOARD_TABLE_CSS}{PAGE_CSS}'
+        '</head>\n<body>\n'
+        f'{title_image}'
+        "<hr style='border: 1px solid #000; width: 100%;'>\n"
+        f"{''.join(sections)}"
+        f"<p style='text-align: center;'>Last updated {updated_at:%Y-%m-%d %H:%M:%S}</p>\n"
+        '<hr>\n'
+        f'{leaderboard.FOOTER_HTML}\n'
+        '</body>\n</html>\n'
+    )
+
+# Content digest recorded in a previous export, so a restart does not rewrite unchanged files
+def written_digest(output_dir):
+    try:
+        with open(os.path.join(output_dir, JSON_FILE), encoding='utf-8') as f:
+            return json.load(f).get('content_digest')
+    except (OSError, ValueError):
+        return None
+
+# Write the page and JSON for the latest snapshot when their numbers changed.
+# Returns the content digest of the files now on disk.
+def export_once(event, output_dir, last_digest):
+    snapshot = leaderboard.load_data(event.key)
+    if snapshot is None:
+        print(f'Error loading data: {leaderboard.get_sheet_poller(event.key).last_error}', file=sys.stderr)
+        return last_digest
+
+    payload = leaderboard_payload(event, snapshot)
+    content = json.dumps(payload, default=_json_value, ensure_ascii=False, sort_keys=True)
+    content_digest = hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+    if content_digest == last_digest:
+        return last_digest
+
+    updated_at = datetime.now(pytz.timezone('Asia/Kolkata'))
+    payload.update(content_digest=content_digest, updated_at=updated_at.isoformat())
+    with atomic_write(os.path.join(output_dir, JSON_FILE)) as f:
+        json.dump(payload, f, default=_json_value, ensure_ascii=False, indent=1)
+    # The page goes last, so a page never links numbers older than the JSON
+    with atomic_write(os.path.join(output_dir, HTML_FILE)) as f:
+        f.write(leaderboard_page(event, snapshot, updated_at))
+    print(f'{updated_at:%H:%M:%S} wrote {output_dir} ({snapshot.digest[:12]})')
+    return content_digest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write the leaderboard as static HTML and JSON files.')
+    parser.add_argument('output_dir', help='directory the static files are written to')
+    parser.add_argument('--event', help='event key from LEADERBOARD_EVENTS (default: the default event)')
+    parser.add_argument('--interval', type=float, help="seconds between checks (default: the event's refresh interval)")
+    parser.add_argument('--once', action='store_true', help='export once and exit')
+    args = parser.parse_args()
+
+    events, default_key = leaderboard.get_events()
+    event_key = args.event or default_key
+    if event_key not in events:
+        parser.error(f"unknown event '{event_key}', expected one of {', '.join(events)}")
+    event = events[event_key]
+    interval = args.interval if args.interval is not None else event.refresh_seconds
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    last_digest = written_digest(args.output_dir)
+    while True:
+        last_digest = export_once(event, args.output_dir, last_digest)
+        if args.once:
+            break
+        time.sleep(interval)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+
+# Open a temporary file next to `path` and rename it over `path` once the block has
+# written it, so readers (the static server, a restarting process) see either the old
+# file or the new one, never half of it. On an error the temporary file is removed
+# and `path` is left as it was.
+@contextmanager
+def atomic_write(path, mode='w'):
+    directory = os.path.dirname(path) or '.'
+    encoding = None if 'b' in mode else 'utf-8'
+    with tempfile.NamedTemporaryFile(mode, encoding=encoding, dir=directory, prefix='.tmp-', delete=False) as f:
+        try:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        except BaseException:
+            f.close()
+            os.unlink(f.name)
+            raise
+    # Temporary files are private, web servers need to read the result
+    os.chmod(f.name, 0o644)
+    os.replace(f.name, path)
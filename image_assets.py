@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import urllib.request
+from html import escape
+from io import BytesIO
+
+from PIL import Image
+
+from data_sources import FETCH_TIMEOUT
+from file_utils import atomic_write
+
+
+# Widths of the variants made of every image, in pixels
+ASSET_WIDTHS = (480, 960, 1600)
+
+# Side of the square page icon
+FAVICON_SIZE = 64
+
+WEBP_QUALITY = 80
+
+# URL prefix of the app's static folder when Streamlit's static serving is enabled
+STATIC_URL = 'app/static'
+
+_MANIFEST = 'manifest.json'
+
+# Google Drive file id in lh3.googleusercontent.com/d/<id> links
+_DRIVE_ID = re.compile(r'/d/([\w-]+)')
+
+
+# Compressed variants of one image in the static folder. URLs carry the content
+# version as ?v=, which the static file server answers with long cache headers.
+class ImageAsset:
+    def __init__(self, name, version, widths, has_alpha=False):
+        self.name = name
+        self.version = version
+        self.widths = widths
+        self.has_alpha = has_alpha
+
+    def url(self, width, fmt='webp'):
+        return f'{STATIC_URL}/assets/{self.name}-{width}.{fmt}?v={self.version}'
+
+    def srcset(self, fmt):
+        return ', '.join(f'{self.url(width, fmt)} {width}w' for width in self.widths)
+
+    # <picture> choosing the WebP (or PNG) variant that fits the displayed width
+    def html(self, alt='', sizes='100vw', style='width: 100%;'):
+        return (
+            '<picture>'
+            f'<source type="image/webp" srcset="{self.srcset("webp")}" sizes="{sizes}">'
+            f'<img src="{self.url(self.widths[len(self.widths) // 2], "png")}" srcset="{self.srcset("png")}" '
+            f'sizes="{sizes}" alt="{escape(alt)}" style="{style}" decoding="async">'
+            '</picture>'
+        )
+
+
+# Local cache of the images the pages show: every source (a URL, or a file in
+# `source_dir`) is fetched once, resized to ASSET_WIDTHS and saved as WebP and PNG
+# in `asset_dir`. A manifest keeps the variants across restarts.
+class ImageAssetCache:
+    def __init__(self, asset_dir, source_dir=None, widths=ASSET_WIDTHS):
+        self.asset_dir = asset_dir
+        self.source_dir = source_dir
+        self.widths = tuple(widths)
+        self._lock = threading.Lock()
+        self._assets = {}
+        self._failed = set()
+        self._load_manifest()
+
+    def _load_manifest(self):
+        try:
+            with open(os.path.join(self.asset_dir, _MANIFEST)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return
+        for source, entry in manifest.items():
+            asset = ImageAsset(entry['name'], entry['version'], tuple(entry['widths']), entry.get('has_alpha', False))
+            if os.path.exists(self.favicon_path(asset)):
+                self._assets[source] = asset
+
+    def _save_manifest(self):
+        manifest = {source: {'name': asset.name, 'version': asset.version, 'widths': list(asset.widths),
+                             'has_alpha': asset.has_alpha}
+                    for source, asset in self._assets.items()}
+        with atomic_write(os.path.join(self.asset_dir, _MANIFEST)) as f:
+            json.dump(manifest, f, indent=1)
+
+    # The variants of `source`, None until they have been built
+    def get(self, source):
+        return self._assets.get(source)
+
+    def favicon_path(self, asset):
+        return os.path.join(self.asset_dir, f'{asset.name}-icon.png')
+
+    # Build the variants of every source not cached yet, on a background thread so
+    # pages keep showing the original URLs meanwhile
+    def prepare_in_background(self, sources):
+        missing = [source for source in dict.fromkeys(sources) if source and source not in self._assets]
+        if missing:
+            threading.Thread(target=self.prepare, args=(missing,), name='image-assets', daemon=True).start()
+
+    def prepare(self, sources):
+        for source in sources:
+            if source in self._assets or source in self._failed:
+                continue
+            try:
+                asset = self._build(source)
+            except Exception:
+                # Unreachable or not an image: keep serving the original
+                self._failed.add(source)
+                continue
+            with self._lock:
+                self._assets[source] = asset
+                self._save_manifest()
+
+    # Original bytes of an image: from source_dir (by file name or Drive id), a local path or the URL
+    def _read(self, source):
+        if self.source_dir is not None:
+            match = _DRIVE_ID.search(source)
+            stem = match.group(1) if match else os.path.splitext(os.path.basename(source))[0]
+            for file_name in sorted(os.listdir(self.source_dir)):
+                if os.path.splitext(file_name)[0] == stem:
+                    with open(os.path.join(self.source_dir, file_name), 'rb') as f:
+                        return f.read()
+        if os.path.isfile(source):
+            with open(source, 'rb') as f:
+                return f.read()
+        with urllib.request.urlopen(source, timeout=FETCH_TIMEOUT) as response:
+            return response.read()
+
+    def _build(self, source):
+        raw = self._read(source)
+        name = hashlib.sha1(source.encode()).hexdigest()[:16]
+        version = hashlib.sha1(raw).hexdigest()[:12]
+        os.makedirs(self.asset_dir, exist_ok=True)
+
+        with Image.open(BytesIO(raw)) as original:
+            has_alpha = original.mode in ('RGBA', 'LA', 'PA') or 'transparency' in original.info
+            image = original.convert('RGBA' if has_alpha else 'RGB')
+
+        # Never upscale: widths above the original collapse onto the original width
+        widths = tuple(sorted({min(width, image.width) for width in self.widths}))
+        for width in widths:
+            height = max(1, round(image.height * width / image.width))
+            variant = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            self._save(variant, f'{name}-{width}.webp', 'WEBP', quality=WEBP_QUALITY, method=6)
+            self._save(variant, f'{name}-{width}.png', 'PNG', optimize=True)
+
+        icon = image.copy()
+        icon.thumbnail((FAVICON_SIZE, FAVICON_SIZE), Image.LANCZOS)
+        self._save(icon, f'{name}-icon.png', 'PNG', optimize=True)
+        return ImageAsset(name, version, widths, has_alpha)
+
+    # The static server never sends half a file
+    def _save(self, image, file_name, fmt, **options):
+        with atomic_write(os.path.join(self.asset_dir, file_name), 'wb') as f:
+            image.save(f, fmt, **options)
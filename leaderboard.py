@@ -7,215 +7,680 @@
 # import pytz
 # import base64
 
+import os
+import sys
 import streamlit as st
+import numpy as np
 import pandas as pd
-import plotly.express as px
 from datetime import datetime, timedelta, time
+from html import escape
 import pytz
 from streamlit_autorefresh import st_autorefresh
-
+import api_server
+import diagnostics
+from change_feed import ChangeFeed
+from data_sources import open_data_source
+from events import EVENTS_CONFIG, EventConfig, entity_slug, load_events
+from image_assets import ImageAssetCache
+from entity_cube import EntityFunctionCube
+from entity_workspace import build_entity_workspaces
+from scoring import SCORE_METRICS, ScoreBasis, ScoredSource, ScoringWeights, load_scoring
+from sheet_poller import RefreshScheduler, SheetPoller
+from score_history import ScoreHistory
+from snapshot_store import STORE_METRICS, SnapshotStore
+from sheet_schema import DATA_MODES
+from result_cache import LRUCache
+from ranking import UNRANKED, rank_entities
+from table_renderer import LEADERBOARD_TABLE_CSS, render_leaderboard_html, table_digest
+from warm_start import WarmStartStore
+
+
+# Frames derived from the shared, read-only snapshot copy their data only when written to
+pd.set_option('mode.copy_on_write', True)
 
 # Loading Data
 
 
-# time to live - you can change this as it is required to be refereshed
-@st.cache_data(ttl=5)
-def load_data(sheet_url):
-    try:
-        data = pd.read_csv(sheet_url)
-        return data
-    except Exception as e:
-        st.error(f"Error loading data: {str(e)}")
+# How often the background poller re-checks the sheet, in seconds - you can change this as it is required to be refereshed
+REFRESH_INTERVAL = float(os.environ.get('LEADERBOARD_REFRESH_SECONDS', 5))
+
+# 'fragment' reruns only the live numbers and table, 'page' reruns the whole script with st_autorefresh
+LIVE_UPDATE_MODE = os.environ.get('LEADERBOARD_LIVE_UPDATE', 'fragment')
+
+# Seconds between live updates of each viewer's page
+LIVE_UPDATE_INTERVAL = int(os.environ.get('LEADERBOARD_LIVE_UPDATE_SECONDS', 60))
+
+# How tied entities are ranked: 'min' (1, 2, 2, 4), 'dense' (1, 2, 2, 3) or 'ordinal' (1, 2, 3, 4)
+RANK_METHOD = os.environ.get('LEADERBOARD_RANK_METHOD', 'min')
+
+# Show only the best N entities on the board, unset to show every entity
+LEADERBOARD_TOP_K = int(os.environ['LEADERBOARD_TOP_K']) if os.environ.get('LEADERBOARD_TOP_K') else None
+
+# Where the data is read from, defaults to the published Google Sheet below.
+# Also accepts a local CSV, a Parquet/Arrow file or a SQLite table, see open_data_source
+DATA_SOURCE = os.environ.get('LEADERBOARD_DATA_SOURCE')
+
+# URL to your Google Sheets data
+DEFAULT_SHEET_URL = "https://docs.google.com/spreadsheets/d/e/2PACX-1vSid0QnQOYSzZBEtZHwGhzkgdFF7pcxHxs8evjsqZ9H4vspzUlAg8JcuRNNj56XZZtnIxwlasRxjYhg/pub?gid=2141420671&single=true&output=csv"
+
+# Worker threads shared by the pollers of every event served by this process
+REFRESH_WORKERS = int(os.environ.get('LEADERBOARD_REFRESH_WORKERS', 4))
+
+# Port of the read-only JSON API served next to the app (see api_server.py), unset to disable it
+API_PORT = int(os.environ['LEADERBOARD_API_PORT']) if os.environ.get('LEADERBOARD_API_PORT') else None
+
+# Directory where each event's last good snapshot and results are saved for a fast restart, unset to disable
+WARM_START_DIR = os.environ.get('LEADERBOARD_WARM_START_DIR')
+
+# Data not confirmed by the source for this many seconds is shown with its age
+STALE_AFTER = float(os.environ.get('LEADERBOARD_STALE_SECONDS', 120))
+
+# Scoring weights of the built-in event (JSON file, see scoring.py); unset uses the sheet's Total columns
+SCORING_CONFIG = os.environ.get('LEADERBOARD_SCORING')
+
+# Resized images are written to the static folder Streamlit serves at app/static
+STATIC_ASSET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'assets')
+
+# Directory holding the original images (named by file name or Drive id), unset to fetch them once from their URLs
+ASSET_SOURCE_DIR = os.environ.get('LEADERBOARD_ASSET_SOURCE_DIR')
+
+# When set, the diagnostics panel only opens with ?diagnostics=<this key>
+DIAGNOSTICS_KEY = os.environ.get('LEADERBOARD_DIAGNOSTICS_KEY')
+
+# One refresh pool per server process; each event keeps its own schedule on it
+@st.cache_resource
+def get_refresh_scheduler():
+    return RefreshScheduler(REFRESH_WORKERS)
+
+# One poller per event per server process, shared by every viewer session
+@st.cache_resource
+def get_sheet_poller(event_key):
+    event = get_event(event_key)
+    source = open_data_source(event.source, day_start=current_daily_window_start)
+    scoring = get_scoring(event_key)
+    if scoring is not None:
+        # OPS scores computed from the base metrics instead of read from the sheet
+        source = ScoredSource(source, scoring)
+    poller = SheetPoller(source, event.refresh_seconds, name=event.key)
+    history = get_score_history(event_key)
+    store = get_snapshot_store(event.snapshot_db) if event.snapshot_db is not None else None
+    feed = get_change_feed(event_key)
+    poller.add_listener(lambda snapshot: publish_snapshot_totals(snapshot, history, store, feed))
+
+    if WARM_START_DIR is not None:
+        # Serve the board saved before the last restart while the first fetch runs
+        warm_start = WarmStartStore(os.path.join(WARM_START_DIR, f'{event.key}.pickle'))
+        results_cache = get_results_cache(event_key)
+        saved = warm_start.load()
+        if saved is not None:
+            poller.seed(saved.snapshot)
+            # Changes are reported against the restored board, not against nothing
+            feed.update(saved.snapshot.fetched_at, aggregate_entity_metrics(saved.snapshot.data)['Total'])
+            for key, results in saved.results.items():
+                results_cache.put(key, results)
+        poller.add_listener(lambda snapshot: save_warm_start(snapshot, results_cache, warm_start))
+
+    return poller.start(get_refresh_scheduler())
+
+# Official scoring weights of one event, None when the sheet's Total columns are used
+@st.cache_resource(show_spinner=False)
+def get_scoring(event_key):
+    spec = get_event(event_key).scoring
+    return load_scoring(spec) if spec is not None else None
+
+# One API server per process, answering from the same pollers and results caches as the pages
+@st.cache_resource(show_spinner=False)
+def get_api_server(port):
+    return api_server.serve_in_background(sys.modules[__name__], port)
+
+# Compute the results of a new snapshot on the poller thread and save both to disk,
+# so the first viewers after a change or a restart find them ready
+def save_warm_start(snapshot, results_cache, warm_start):
+    saved = []
+    for data_mode in DATA_MODES:
+        # Daily numbers from the snapshot history depend on the time, they are not saved
+        if f'{data_mode} Total' not in snapshot.data.columns:
+            continue
+        key = (snapshot.digest, data_mode)
+        def build():
+            results = build_leaderboard_results(snapshot.data, data_mode, snapshot_cube(snapshot, results_cache),
+                                                results_cache)
+            results['key'] = key
+            return results
+        # Sessions asking for the same results meanwhile wait for these instead of building their own
+        saved.append(results_cache.get_or_compute(key, build))
+    warm_start.save(snapshot, saved)
+
+# Read the latest in-memory snapshot; sessions never wait on the data source once it has loaded
+def load_data(event_key):
+    poller = get_sheet_poller(event_key)
+    snapshot = poller.latest()
+    if snapshot is None:
+        st.error(f"Error loading data: {str(poller.last_error)}")
         return None
+    return snapshot
+
+# Metrics summed per entity, keyed by the sheet column suffix ('{data_mode} Applied', ...)
+ENTITY_METRICS = {
+    'Applied': 'Total_Applied',
+    'Approved': 'Total_Approved',
+    'MoUs': 'Total_MoUs',
+    'SUs': 'Total_SUs',
+    'Total': 'Total',
+}
+
+# Function to aggregate every per-entity metric for every data mode in a single grouped pass
+# Returns one frame indexed by Entity with (data_mode, metric) columns
+def aggregate_entity_metrics(df):
+    columns = {}
+    for mode in DATA_MODES:
+        for metric, name in ENTITY_METRICS.items():
+            if f'{mode} {metric}' in df.columns:
+                columns[f'{mode} {metric}'] = (mode, name)
+
+    sums = df.groupby('Entity', sort=False, observed=True)[list(columns)].sum()
+    sums.columns = pd.MultiIndex.from_tuples(list(columns.values()))
+
+    # APL -> APD ratio, aligned on Entity rather than on row position
+    for mode in DATA_MODES:
+        if (mode, 'Total_Applied') in sums.columns and (mode, 'Total_Approved') in sums.columns:
+            sums[(mode, 'APL_to_APD')] = applied_to_approved_ratio(
+                sums[(mode, 'Total_Applied')], sums[(mode, 'Total_Approved')])
+
+    return sums
+
+# Function to calculate the %applied to approved ratio of aligned applied and approved totals
+def applied_to_approved_ratio(applied, approved):
+    applied = applied.to_numpy(dtype='float64', na_value=0)
+    approved = approved.to_numpy(dtype='float64', na_value=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.round(approved * 100 / applied, 2)
+    # Replace any inf or NaN values with 0, in case of division by zero
+    return np.where(np.isfinite(ratio), ratio, 0)
 
-# Function to calculate the total 'Applied' related to each entity
-def calculate_total_applied(df, data_mode):
-    entity_applied_total = {}
-    for index, row in df.iterrows():
-        entity = row['Entity']
-        applied = row[f'{data_mode} Applied']
-        if entity not in entity_applied_total:
-            entity_applied_total[entity] = applied
-        else:
-            entity_applied_total[entity] += applied
-    return entity_applied_total
-
-# Function to calculate the total 'Approved' related to each entity
-def calculate_total_approved(df, data_mode):
-    entity_approved_total = {}
-    for index, row in df.iterrows():
-        entity = row['Entity']
-        approved = row[f'{data_mode} Approved']
-        if entity not in entity_approved_total:
-            entity_approved_total[entity] = approved
-        else:
-            entity_approved_total[entity] += approved
-    return entity_approved_total
-
-# Function to calculate the total SUs related to each entity
-def calculate_total_mou(df, data_mode):
-    entity_sus_total = {}
-    for index, row in df.iterrows():
-        entity = row['Entity']
-        sus = row[f'{data_mode} MoUs']
-        if entity not in entity_sus_total:
-            entity_sus_total[entity] = sus
-        else:
-            entity_sus_total[entity] += sus
-    return entity_sus_total
-
-# Function to calculate the total points of each entity
-def calulate_total_points(df, data_mode):
-    entity_sum = {}
-    for index, row in df.iterrows():
-        entity = row['Entity']
-        total = row[f'{data_mode} Total']
-        if entity not in entity_sum:
-            entity_sum[entity] = total
-        else:
-            entity_sum[entity] += total
-    return entity_sum
+# Function to pick the per-entity metrics of one data mode out of the aggregated frame
+def entity_metrics(aggregated, data_mode):
+    metrics = aggregated[data_mode].reset_index()
+    metrics.columns.name = None
+    return metrics
 
-def count_SUs_by_entity(df, selected_function, data_mode):
-    filtered_df = df[df['Function'] == selected_function]
-    su_counts = filtered_df.groupby('Entity')[f'{data_mode} SUs'].sum().reset_index()
-    su_counts.rename(columns={f'{data_mode} SUs': 'Count_SUs'}, inplace=True)
-    return su_counts
+def count_SUs_by_entity(cube, selected_function, data_mode):
+    su_counts = cube.by_entity('SUs', data_mode, selected_function).reset_index()
+    return su_counts.rename(columns={'SUs': 'Count_SUs'})
 
 # Function to calculate the count of 'Applied' related to each entity based on the selected function
-def count_applied_by_entity(df, selected_function, data_mode):
-    filtered_df = df[df['Function'] == selected_function]
-    applied_counts = filtered_df.groupby(
-        'Entity')[f'{data_mode} Applied'].sum().reset_index()
-    applied_counts.rename(columns={f'{data_mode} Applied': 'Count_Applied'}, inplace=True)
-    return applied_counts
+def count_applied_by_entity(cube, selected_function, data_mode):
+    applied_counts = cube.by_entity('Applied', data_mode, selected_function).reset_index()
+    return applied_counts.rename(columns={'Applied': 'Count_Applied'})
 
 # Function to calculate the count of 'Approved' related to each entity based on the selected function
-def count_approved_by_entity(df, selected_function, data_mode):
-    filtered_df = df[df['Function'] == selected_function]
-    approved_counts = filtered_df.groupby(
-        'Entity')[f'{data_mode} Approved'].sum().reset_index()
-    approved_counts.rename(
-        columns={f'{data_mode} Approved': 'Count_Approved'}, inplace=True)
-    return approved_counts
+def count_approved_by_entity(cube, selected_function, data_mode):
+    approved_counts = cube.by_entity('Approved', data_mode, selected_function).reset_index()
+    return approved_counts.rename(columns={'Approved': 'Count_Approved'})
 
 # Function to calculate the %applied to approved ratio for each entity on the selected function
-def count_applied_to_approved_ratio(df, selected_function, data_mode):
-    filtered_df = df[df['Function'] == selected_function]
-    applied_to_approved_ratio = filtered_df.groupby(
-        'Entity')[f'{data_mode} %APL-APD'].sum().reset_index()
-    applied_to_approved_ratio.rename(
-        columns={f'{data_mode} %APL-APD': 'Applied_to_Approved_Ratio'}, inplace=True)
-    return applied_to_approved_ratio
+def count_applied_to_approved_ratio(cube, selected_function, data_mode):
+    applied_to_approved_ratio = cube.by_entity('%APL-APD', data_mode, selected_function).reset_index()
+    return applied_to_approved_ratio.rename(columns={'%APL-APD': 'Applied_to_Approved_Ratio'})
+
+# Function to get the applications and approvals of every function across all entities
+def function_totals(cube, data_mode):
+    totals = pd.concat([cube.by_function('Applied', data_mode), cube.by_function('Approved', data_mode)], axis=1)
+    totals['APL_to_APD'] = applied_to_approved_ratio(totals['Applied'], totals['Approved'])
+    return totals
 
 # Function to caulculate ranks and display medals for top 3 ranks
-def display_score_ranks(df):
-    # Calculate ranks based on scores
-    df_with_ranks = df.sort_values(by=f'Total', ascending=False)
-    df_with_ranks['Rank'] = range(1, len(df_with_ranks) + 1)
-
-    # Replace rank number with - if the total is 0
-    df_with_ranks['Rank'] = df_with_ranks.apply(lambda row:
-                                                '-' if row['Total'] == 0 else row['Rank'], axis=1)
-
-    # Apply gold, silver, and bronze medals to the 'Entity' column
-    df_with_ranks['Entity'] = df_with_ranks.apply(lambda row:
-                                                  f"🥇 {row['Entity']}" if (row['Rank'] == 1 and row['Total'] != 0) else
-                                                  f"🥈 {row['Entity']}" if (row['Rank'] == 2 and row['Total'] != 0) else
-                                                  f"🥉 {row['Entity']}" if (row['Rank'] == 3 and row['Total'] != 0) else
-                                                  row['Entity'], axis=1)
-
-    # display the leaderboard section
-    return df_with_ranks
-
-# Function to create total applications bar chart and data
-def applied_bar_chart_and_data(data, data_mode):
-    # Calculate total 'Applied' related to each entity
-    entity_applied_total = calculate_total_applied(data, data_mode)
-
-    # Convert dictionary to DataFrame
-    df_entity_applied_total = pd.DataFrame.from_dict(
-        entity_applied_total, orient='index', columns=['Total_Applied'])
-    df_entity_applied_total.reset_index(inplace=True)
-    df_entity_applied_total.rename(columns={'index': 'Entity'}, inplace=True)
-
-    # Create a colored bar chart using Plotly Express
-    fig_applied = px.bar(df_entity_applied_total, x='Entity', y='Total_Applied', title=f'🌍 {data_mode} Applications by Entity', labels={
-                         'Entity': 'Entity', 'Total_Applied': 'Applications'}, color='Entity')
+def display_score_ranks(df, top_k=None):
+    # Ties share a rank according to RANK_METHOD, zero scores are shown as -
+    return rank_entities(df, 'Total', method=RANK_METHOD, top_k=top_k)
+
+# Function to get the total applications of each entity
+def applied_data(metrics):
+    return metrics[['Entity', 'Total_Applied']]
+
+# Function to get the total approvals of each entity
+def approved_data(metrics):
+    return metrics[['Entity', 'Total_Approved']]
+
+# Function to get the applied to approved ratio of each entity
+def applied_to_approved_ratio_data(metrics):
+    # the ratio is computed per entity by aggregate_entity_metrics
+    return metrics[['Entity', 'APL_to_APD']]
+
+# Function to get the total MoUs of each entity
+def mou_data(metrics):
+    return metrics[['Entity', 'Total_MoUs']]
+
+# Function to create a colored per-entity bar chart of one metric using Plotly Express
+def build_entity_bar_chart(df, y, title, label):
+    # Plotly is only imported once a view actually shows a chart
+    import plotly.express as px
+
+    fig = px.bar(df, x='Entity', y=y, title=title, labels={'Entity': 'Entity', y: label}, color='Entity')
 
     # Hide the legend
-    functional_bar_charts_formatting(fig_applied)
-
-    return fig_applied, df_entity_applied_total
-
-# Function to create total approvals bar chart and data
-def approved_bar_chart_and_data(data, data_mode):
-    # Calculate total 'Approved' related to each entity
-    entity_approved_total = calculate_total_approved(data, data_mode)
-
-    # Convert dictionary to DataFrame
-    df_entity_approved_total = pd.DataFrame.from_dict(
-        entity_approved_total, orient='index', columns=['Total_Approved'])
-    df_entity_approved_total.reset_index(inplace=True)
-    df_entity_approved_total.rename(columns={'index': 'Entity'}, inplace=True)
-    # Create a colored bar chart using Plotly Express
-    fig_approved = px.bar(df_entity_approved_total, x='Entity', y='Total_Approved', title=f'✅ {data_mode} Approvals by Entity', labels={
-                          'Entity': 'Entity', 'Total_Approved': 'Approvals'}, color='Entity')
-    # Hide the legend
-    functional_bar_charts_formatting(fig_approved)
+    functional_bar_charts_formatting(fig)
+
+    return fig
+
+# Function to get a per-entity bar chart, built only the first time its data is seen in `cache`
+# (the event's results cache)
+def entity_bar_chart(df, y, title, label, cache=None):
+    if cache is None:
+        return build_entity_bar_chart(df, y, title, label)
+    key = ('figure', table_digest(df), y, title)
+    return cache.get_or_compute(key, lambda: build_entity_bar_chart(df, y, title, label))
+
+# Function to create total applications bar chart
+def applied_bar_chart(df_entity_applied_total, data_mode):
+    return entity_bar_chart(df_entity_applied_total, 'Total_Applied',
+                            f'🌍 {data_mode} Applications by Entity', 'Applications')
+
+# Function to create total approvals bar chart
+def approved_bar_chart(df_entity_approved_total, data_mode):
+    return entity_bar_chart(df_entity_approved_total, 'Total_Approved',
+                            f'✅ {data_mode} Approvals by Entity', 'Approvals')
+
+# Function to create applied to approved ratio bar chart
+def applied_to_approved_ratio_bar_chart(apl_to_apd, data_mode):
+    return entity_bar_chart(apl_to_apd, 'APL_to_APD',
+                            f'📊 {data_mode} Applied to Approved Ratio by Entity', '%Applied to Approved')
+
+# Function to create total SUs bar chart
+def mou_bar_chart(df_entity_sus_total, data_mode):
+    return entity_bar_chart(df_entity_sus_total, 'Total_MoUs',
+                            f'📩 {data_mode} SUs by Entity', 'Total MoUs')
+
+# Function to get total points of each entity
+def total_points(metrics, data_mode):
+    return metrics[['Entity', 'Total']]
+
+# Megabytes of derived results (tables, charts, cubes, API bodies) kept in memory per event,
+# unless the event sets cache_mb
+DERIVED_CACHE_MB = 64
+
+# Derived results of one event, shared by every session of this server process and
+# evicted least recently used first once their estimated size exceeds the event's budget
+@st.cache_resource
+def get_results_cache(event_key):
+    return LRUCache(maxbytes=get_event(event_key).cache_mb * 2**20)
+
+# Function to compute every derived leaderboard result for one data mode
+def build_leaderboard_results(data, data_mode, cube=None, cache=None):
+    # calculation of leaderboard items, all metrics in one grouped pass
+    with diagnostics.stage('aggregate'):
+        aggregated = aggregate_entity_metrics(data)
+    with diagnostics.stage('merge'):
+        df_combined = entity_metrics(aggregated, data_mode)
+    return results_from_metrics(df_combined, data_mode, cube, cache)
+
+# Function to compute the charts, table, totals and entity workspaces from the combined per-entity frame
+# (per-function numbers in the workspaces come from the snapshot's cube, when there is one,
+# and unchanged table HTML is reused from `cache`)
+def results_from_metrics(df_combined, data_mode, cube=None, cache=None):
+    # Figures are built later, only by views that display them
+    df_entity_applied_total = applied_data(df_combined)
+    df_entity_approved_total = approved_data(df_combined)
+    df_entity_mou_total = mou_data(df_combined)
+    df_entity_apltoapd_total = applied_to_approved_ratio_data(df_combined)
+    df_ranks = total_points(df_combined, data_mode)
+
+    with diagnostics.stage('rank'):
+        df_table, missing_column = leaderboard_table(df_combined, data_mode)
+
+    # Render the table HTML, including the rank column as a standard column
+    html_table = None
+    if df_table is not None:
+        with diagnostics.stage('render'):
+            html_table = render_leaderboard_html(df_table, data_mode, cache)
+
+    # Every entity's page, so viewing one is a lookup
+    with diagnostics.stage('workspaces'):
+        workspaces = build_entity_workspaces(df_combined, data_mode, cube, RANK_METHOD)
+
+    return {
+        'df_entity_applied_total': df_entity_applied_total,
+        'df_entity_approved_total': df_entity_approved_total,
+        'df_entity_mou_total': df_entity_mou_total,
+        'df_entity_apltoapd_total': df_entity_apltoapd_total,
+        'df_ranks': df_ranks,
+        'df_combined': df_combined,
+        'df_table': df_table,
+        'missing_column': missing_column,
+        'html_table': html_table,
+        'workspaces': workspaces,
+        # Calculate total values
+        'total_applied': df_combined['Total_Applied'].sum(),
+        'total_approved': df_combined['Total_Approved'].sum(),
+        'total_mou': df_combined['Total_MoUs'].sum(),
+    }
 
-    return fig_approved, df_entity_approved_total
+# Function to get the derived results of a snapshot, memoized on (digest, data_mode)
+# so an unchanged sheet does no pandas work on rerun
+def leaderboard_results(event, snapshot, data_mode):
+    cache = get_results_cache(event.key)
+
+    # Daily numbers from the snapshot history when the sheet has no Daily columns,
+    # keyed on the two snapshots they are the difference of
+    window_ids = None
+    if data_mode == 'Daily' and f'{data_mode} Total' not in snapshot.data.columns:
+        window_ids = daily_window_ids(event.snapshot_db)
+        if window_ids is None:
+            return None
+        key = (snapshot.digest, data_mode, window_ids)
+    else:
+        key = (snapshot.digest, data_mode)
+
+    computed = False
+    def build():
+        nonlocal computed
+        computed = True
+        if window_ids is not None:
+            window = get_snapshot_store(event.snapshot_db).window_between(*window_ids)
+            results = results_from_metrics(window_metrics(window), data_mode, cache=cache)
+        else:
+            results = build_leaderboard_results(snapshot.data, data_mode, snapshot_cube(snapshot, cache), cache)
+        # Identifies these numbers, e.g. for the API's ETags
+        results['key'] = key
+        return results
+
+    # Sessions rerunning at once after a sheet change wait for one of them to build the results
+    results = cache.get_or_compute(key, build)
+    diagnostics.event('results_cache', event=event.key, result='miss' if computed else 'hit')
+    return results
+
+# Function to get the Entity x Function cube of a snapshot, built once per sheet digest
+# so switching the selected function is only a lookup
+def entity_function_cube(event, snapshot):
+    return snapshot_cube(snapshot, get_results_cache(event.key))
+
+# The cube of a snapshot in `results_cache`, None when the sheet has no Function column
+def snapshot_cube(snapshot, results_cache):
+    if 'Function' not in snapshot.data.columns:
+        return None
+    def build():
+        with diagnostics.stage('cube'):
+            return EntityFunctionCube.from_frame(snapshot.data)
+    return results_cache.get_or_compute((snapshot.digest, 'cube'), build)
+
+# Function to get the Entity x (Function, metric) matrix the what-if scores are computed from
+def score_basis(event, snapshot, cube, data_mode):
+    return get_results_cache(event.key).get_or_compute(
+        (snapshot.digest, 'basis', data_mode), lambda: ScoreBasis(cube, data_mode))
+
+# Snapshot history of the built-in event used for Daily numbers, kept only when LEADERBOARD_SNAPSHOT_DB is set
+SNAPSHOT_DB = os.environ.get('LEADERBOARD_SNAPSHOT_DB')
+
+@st.cache_resource
+def get_snapshot_store(path):
+    return SnapshotStore(path)
+
+# Points kept per entity for the score-over-time charts before older points are downsampled
+HISTORY_POINTS = int(os.environ.get('LEADERBOARD_HISTORY_POINTS', 720))
+
+# Per-entity score, applications and rank over time, seeded from the snapshot store if kept
+@st.cache_resource
+def get_score_history(event_key):
+    history = ScoreHistory(HISTORY_POINTS)
+    snapshot_db = get_event(event_key).snapshot_db
+    if snapshot_db is not None:
+        store = get_snapshot_store(snapshot_db)
+        for snapshot_id, taken_at in store.snapshots():
+            history.record(taken_at, store.vector(snapshot_id).reset_index())
+    return history
+
+# Changes between consecutive snapshots of one event, shared by every session
+@st.cache_resource
+def get_change_feed(event_key):
+    return ChangeFeed(rank_method=RANK_METHOD)
+
+# Feed the Total per-entity aggregates of every new snapshot to the change feed, the history and the store
+def publish_snapshot_totals(snapshot, history, store, feed):
+    totals = aggregate_entity_metrics(snapshot.data)['Total']
+    feed.update(snapshot.fetched_at, totals)
+    if store is not None:
+        store.append(snapshot.digest, totals, snapshot.fetched_at)
+    history.record(snapshot.fetched_at, totals.reset_index())
+
+# (start id, end id) of the snapshots the change since the last 8 PM is computed from,
+# None until a snapshot from before it has been saved
+def daily_window_ids(snapshot_db):
+    if snapshot_db is None:
+        return None
+    return get_snapshot_store(snapshot_db).window_ids(current_daily_window_start().timestamp())
+
+# Function to turn a snapshot window into the combined per-entity frame
+def window_metrics(window):
+    metrics = window.metrics
+    # The history stores floats, show whole counts as integers again
+    for col in STORE_METRICS:
+        if (metrics[col] % 1 == 0).all():
+            metrics[col] = metrics[col].astype('int64')
+    metrics['APL_to_APD'] = applied_to_approved_ratio(metrics['Total_Applied'], metrics['Total_Approved'])
+    return metrics
 
-# Function to create applied to approved ratio bar chart and data
-def applied_to_approved_ratio_bar_chart_and_data(df_entity_apd_total, df_entity_apl_total, data_mode):
-    # calculate the ratio of applied to approved (APD/APL)
-    # divide the pd.dataframe of total approved by total applied
+# Function to create the OPS score over time and rank race charts from the cached series
+def trend_charts(history):
+    import plotly.express as px
 
-    apl_to_apd = pd.DataFrame({
-        # use entity column as the index
-        'Entity': df_entity_apd_total['Entity'],
-        'APL_to_APD': round(df_entity_apd_total['Total_Approved']*100 / df_entity_apl_total['Total_Applied'], 2)
-    })
+    series = history.series()
+    series['time'] = series['time'].dt.tz_convert('Asia/Kolkata')
 
-    # Replace any inf or NaN values with 0, in case of division by zero
-    apl_to_apd['APL_to_APD'] = apl_to_apd['APL_to_APD'].replace(
-        [float('inf'), float('nan')], 0)
+    fig_score = px.line(series, x='time', y='Total', color='Entity', title='📈 OPS Score Over Time',
+                        labels={'time': 'Time', 'Total': 'OPS Score'})
+    functional_bar_charts_formatting(fig_score)
+    fig_score.update_layout(showlegend=True)
 
-    fig_apl_to_apd = px.bar(apl_to_apd, x='Entity', y='APL_to_APD', title=f'📊 {data_mode} Applied to Approved Ratio by Entity', labels={
-                            'Entity': 'Entity', 'APL_to_APD': '%Applied to Approved'}, color='Entity')
+    fig_race = px.line(series, x='time', y='Rank', color='Entity', markers=True, title='🏁 Rank Race',
+                       labels={'time': 'Time', 'Rank': 'Rank'})
+    functional_bar_charts_formatting(fig_race)
+    fig_race.update_layout(showlegend=True)
+    # Rank 1 at the top
+    fig_race.update_yaxes(autorange='reversed', dtick=1)
 
-    functional_bar_charts_formatting(fig_apl_to_apd)
+    return fig_score, fig_race
 
-    return fig_apl_to_apd, apl_to_apd
+# Function to display the trend charts, rebuilt only when a new snapshot was recorded
+def display_trends(event):
+    history = get_score_history(event.key)
+    if history.version == 0:
+        st.info('Score history will appear once the first snapshot of the sheet has been recorded.')
+        return
 
-# Function to create total SUs bar chart and data
-def mou_bar_chart_and_data(data, data_mode):
-    entity_sus_total = calculate_total_mou(data, data_mode)
+    fig_score, fig_race = get_results_cache(event.key).get_or_compute(
+        ('trends', history.version), lambda: trend_charts(history))
 
-    df_entity_sus_total = pd.DataFrame.from_dict(
-        entity_sus_total, orient='index', columns=['Total_MoUs'])
-    df_entity_sus_total.reset_index(inplace=True)
-    df_entity_sus_total.rename(columns={'index': 'Entity'}, inplace=True)
+    st.divider()
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        st.plotly_chart(fig_score, use_container_width=True)
+    with col2:
+        st.plotly_chart(fig_race, use_container_width=True)
 
-    fig_sus = px.bar(df_entity_sus_total, x='Entity', y='Total_MoUs', 
-                     title=f'📩 {data_mode} SUs by Entity', 
-                     labels={'Entity': 'Entity', 'Total_MoUs': 'Total MoUs'}, 
-                     color='Entity')
+# Function to display the per-function charts, all served from the cube of the snapshot
+def display_functional_analysis(cube, data_mode, cache):
+    if not cube.has('Applied', data_mode):
+        st.info(f'Functional numbers are not available for {data_mode} data.')
+        return
 
-    functional_bar_charts_formatting(fig_sus)
+    st.divider()
 
-    return fig_sus, df_entity_sus_total
+    col11, col12 = st.columns([9, 2])
 
-# Function to get total points of each entity
-def total_points(data, data_mode):
-    entity_points_total = calulate_total_points(data, data_mode)
-    df_entity_points_total = pd.DataFrame.from_dict(
-        entity_points_total, orient='index', columns=['Total'])
-    df_entity_points_total.reset_index(inplace=True)
-    df_entity_points_total.rename(columns={'index': 'Entity'}, inplace=True)
+    with col11:
+
+        st.subheader('Functional Analysis')
+        # Create a select box to choose the 'Function'
+        selected_function = st.selectbox(
+            'Select Function', list(cube.functions))
+
+        totals = function_totals(cube, data_mode).loc[selected_function]
+        st.caption(f"All entities: {int(totals['Applied'])} applications, {int(totals['Approved'])} approvals "
+                   f"({totals['APL_to_APD']}% applied to approved)")
+
+    with col12:
+        functional_image_rendering(selected_function)
+
+    SU_counts = count_SUs_by_entity(cube, selected_function, data_mode)
+    fig_0 = entity_bar_chart(SU_counts, 'Count_SUs',
+                             f'📩 {data_mode} Sign Ups by Entity for {selected_function} Function', 'Sign Ups', cache)
+
+    # Get the count of 'Applied' related to each entity based on the selected function
+    applied_counts = count_applied_by_entity(cube, selected_function, data_mode)
+    fig_1 = entity_bar_chart(applied_counts, 'Count_Applied',
+                             f'🌍 {data_mode} Applications by Entity for {selected_function} Function', 'Applications', cache)
+
+    # Get the count of 'Approved' related to each entity based on the selected function
+    approved_counts = count_approved_by_entity(cube, selected_function, data_mode)
+    fig_2 = entity_bar_chart(approved_counts, 'Count_Approved',
+                             f'✅ {data_mode} Approvals by Entity for {selected_function} Function', 'Approvals', cache)
+
+    applied_to_approved_percent = count_applied_to_approved_ratio(cube, selected_function, data_mode)
+    fig_3 = entity_bar_chart(applied_to_approved_percent, 'Applied_to_Approved_Ratio',
+                             f'📊 {data_mode} Applied to Approved Ratio by Entity for {selected_function} Function',
+                             'Applied to Approved Ratio', cache)
+
+    if selected_function == "oGV" or selected_function == "oGTa" or selected_function == "oGTe":
+        col301, col302 = st.columns(2)
+
+        with col301:
+            st.plotly_chart(fig_0, use_container_width=True)
 
-    # return df_ranks
-    return df_entity_points_total
+        with col302:
+            st.plotly_chart(fig_1, use_container_width=True)
+
+        col311, col312 = st.columns(2)
+
+        with col311:
+            st.plotly_chart(fig_2, use_container_width=True)
+
+        with col312:
+            st.plotly_chart(fig_3, use_container_width=True)
+
+    else:
+        col5, col6 = st.columns(2)
+
+        with col5:
+            st.plotly_chart(fig_1, use_container_width=True)
+
+        with col6:
+            st.plotly_chart(fig_2, use_container_width=True)
+
+        col13, col14, col15 = st.columns([1, 2, 1])
+
+        with col14:
+            st.plotly_chart(fig_3, use_container_width=True)
+
+# Function to rank the official and what-if scores side by side, with each entity's rank movement
+def what_if_rankings(official, what_if):
+    official_ranked = rank_entities(official.rename('Score').rename_axis('Entity').reset_index(),
+                                    'Score', method=RANK_METHOD)
+    what_if_ranked = rank_entities(what_if.rename('Score').rename_axis('Entity').reset_index(),
+                                   'Score', method=RANK_METHOD)
+
+    # Both frames keep the row positions of the entities as their index
+    old_ranks = official_ranked['Rank'].reindex(what_if_ranked.index)
+    what_if_ranked['Change'] = [rank_change(old, new) for old, new in zip(old_ranks, what_if_ranked['Rank'])]
+    columns = ['Rank', 'Entity', 'Score']
+    return official_ranked[columns], what_if_ranked[columns + ['Change']]
+
+# Rank movement label, e.g. '▲ 2'
+def rank_change(old, new):
+    if new == UNRANKED or old == new:
+        return ''
+    if old == UNRANKED:
+        return 'new'
+    return f'▲ {old - new}' if new < old else f'▼ {new - old}'
+
+# Function to display the scoring what-if: edit the weights, compare the rankings
+def display_scoring_what_if(event, basis, results, data_mode):
+    st.divider()
+    st.subheader('🧮 Scoring What-If')
+
+    official_weights = get_scoring(event.key)
+    if official_weights is None:
+        st.caption('Official scores are read from the sheet. Edit the points per unit of each metric '
+                   'to see how another weighting would rank the entities.')
+        start = ScoringWeights(dict.fromkeys(SCORE_METRICS, 1)).to_frame(basis.functions)
+    else:
+        st.caption('Official scores use the weights below. Edit them to see how another weighting '
+                   'would rank the entities.')
+        start = official_weights.to_frame(basis.functions)
+
+    edited = st.data_editor(start, key=f'what_if_weights_{event.key}_{data_mode}', use_container_width=True)
+
+    # Only the matrix-vector product and the ranking run on every edit
+    with diagnostics.stage('what_if'):
+        what_if = basis.scores(ScoringWeights.from_frame(edited))
+        official = results['df_combined'].set_index(results['df_combined']['Entity'].astype(str))['Total']
+        official_table, what_if_table = what_if_rankings(
+            official.astype('float64'), what_if.set_axis(what_if.index.astype(str)))
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown(f'**Official {data_mode} ranking**')
+        st.dataframe(official_table, use_container_width=True, hide_index=True)
+    with col2:
+        st.markdown(f'**What-if {data_mode} ranking**')
+        st.dataframe(what_if_table, use_container_width=True, hide_index=True)
+
+# Rank as shown on the entity pages, e.g. '#3'
+def rank_label(rank):
+    return rank if rank == UNRANKED else f'#{rank}'
+
+# Function to display one entity's page from its precomputed workspace
+def display_entity_workspace(event, results, entity_key, data_mode):
+    workspace = results['workspaces'].get(entity_slug(entity_key))
+    if workspace is None:
+        st.error(f"Unknown entity '{entity_key}'. Available entities: {', '.join(sorted(results['workspaces']))}")
+        return
+
+    banner = event.banners.get(workspace.slug)
+    if banner is not None:
+        display_image(banner, full_width=True)
+
+    st.subheader(f'🏢 {workspace.entity} {data_mode} Workspace')
+
+    numbers = workspace.numbers
+    col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
+    with col1:
+        st.markdown(summary_number_html('🏆 Rank', rank_label(workspace.rank)), unsafe_allow_html=True)
+    with col2:
+        st.markdown(summary_number_html(f'🔥 {data_mode} OPS Score', numbers['Total']), unsafe_allow_html=True)
+    with col3:
+        st.markdown(summary_number_html(f'🌍 {data_mode} Applications', numbers['Total_Applied']),
+                    unsafe_allow_html=True)
+    with col4:
+        st.markdown(summary_number_html(f'✅ {data_mode} Approvals', numbers['Total_Approved']),
+                    unsafe_allow_html=True)
+
+    # Distance to the entities just above and below on the board
+    gaps = []
+    if workspace.above is not None:
+        entity, rank, gap = workspace.above
+        gaps.append(f'🔼 {gap:g} points behind <strong>{escape(entity)}</strong> ({rank_label(rank)})' if gap
+                    else f'🔼 Level with <strong>{escape(entity)}</strong> ({rank_label(rank)})')
+    if workspace.below is not None:
+        entity, rank, gap = workspace.below
+        gaps.append(f'🔽 {gap:g} points ahead of <strong>{escape(entity)}</strong> ({rank_label(rank)})' if gap
+                    else f'🔽 Level with <strong>{escape(entity)}</strong> ({rank_label(rank)})')
+    if gaps:
+        st.markdown("<div style='text-align: center; font-size: 20px;'>" + ' &nbsp;|&nbsp; '.join(gaps) + '</div>',
+                    unsafe_allow_html=True)
+
+    if workspace.functions_html is not None:
+        st.divider()
+        st.subheader(f'{data_mode} Numbers by Function')
+        st.markdown(workspace.functions_html, unsafe_allow_html=True)
+
+# HTML of one summary number, shared with the static export
+def summary_number_html(title, value):
+    return (
+        "<div style='text-align: center;'>"
+        f"<h3>{title}</h3>"
+        f"<p style='font-size: 32px;'>{value}</p>"
+        "</div>"
+    )
 
 # display summary details (on the top of the page)
 def display_summary_numbers(total_mou, total_approved, total_applied, data_mode):
@@ -236,94 +701,97 @@ def display_summary_numbers(total_mou, total_approved, total_applied, data_mode)
 
             # Display the total applications in the first column
             with col2:
-                st.markdown(
-                    "<div style='text-align: center;'>"
-                    f"<h3>🌍 {data_mode} Applications</h3>"
-                    f"<p style='font-size: 32px;'>{total_applied}</p>"
-                    "</div>",
-                    unsafe_allow_html=True,
-                )
+                st.markdown(summary_number_html(f'🌍 {data_mode} Applications', total_applied), unsafe_allow_html=True)
 
             # Display the total approvals in the second column
             with col3:
-                st.markdown(
-                    "<div style='text-align: center;'>"
-                    f"<h3>✅ {data_mode} Approvals</h3>"
-                    f"<p style='font-size: 32px;'>{total_approved}</p>"
-                    "</div>",
-                    unsafe_allow_html=True,
-                )
+                st.markdown(summary_number_html(f'✅ {data_mode} Approvals', total_approved), unsafe_allow_html=True)
 
             # Display the conversion rate in the third column
             with col4:
-                st.markdown(
-                    "<div style='text-align: center;'>"
-                    f"<h3>📊 {data_mode} MoUs</h3>"
-                    f"<p style='font-size: 32px;'>{total_mou} </p>"
-                    "</div>",
-                    unsafe_allow_html=True,
-                )
+                st.markdown(summary_number_html(f'📊 {data_mode} MoUs', total_mou), unsafe_allow_html=True)
 
-# Function to display the leaderboard table
-def display_leaderboard_table(df, data_mode):
-    # Apply custom CSS for styling
-    st.markdown(
-        """
-    <style>
-    th, td {
-        font-size: 20px !important;
-        padding: 10px; /* Add padding for better spacing */
-        text-align: center; /* Center-align text */
-        font-weight: 900;
-    }
-    table {
-        width: 100%; /* Full width */
-        border-collapse: collapse; /* Collapse borders */
-    }
-    th {
-        background-color: #FCFCFC; /* Light gray background for headers */
-        border: 5px solid #ddd; /* Add borders to header */
-    }
-    td {
-        border: 1px solid #ddd; /* Add borders to cells */
-    }
-    thead th {
-        background-color: green !important; /* Set the first row's background color to green */
-        color: white !important; /* Optional: Set text color to white for contrast */
-    }
-
-    /* Add media queries for responsiveness */
-    @media screen and (max-width: 768px) {
-        th, td {
-            font-size: 16px !important; /* Reduce font size for small screens */
-            padding: 8px; /* Adjust padding for small screens */
-        }
-    }
+# Function to apply the custom CSS used by the leaderboard table
+# Emitted outside the live fragment, so it is sent once per page load instead of every refresh
+def display_leaderboard_css():
+    st.markdown(LEADERBOARD_TABLE_CSS, unsafe_allow_html=True)
 
-    @media screen and (max-width: 480px) {
-        th, td {
-            font-size: 11px !important; /* Further reduce font size for very small screens */
-            padding: 6px; /* Further adjust padding */
-        }
-    }
-</style>
-
-    """, unsafe_allow_html=True)
+# Function to display the leaderboard table
+def display_leaderboard_table(results, data_mode, changes=None):
+    # Stop if a column was missing when the table was built
+    if results['missing_column'] is not None:
+        st.error(f"Column '{results['missing_column']}' not found in DataFrame.")
+        return
 
+    # Display the HTML table
+    st.markdown(results['html_table'], unsafe_allow_html=True)
+
+    # Flash the rows that changed since this session's last refresh
+    if changes:
+        st.markdown(change_highlight_css(results, changes, data_mode), unsafe_allow_html=True)
+
+# Per-refresh CSS highlighting the changed rows of the table, so the cached table HTML stays the same
+def change_highlight_css(results, changes, data_mode):
+    table = results['df_table']
+    entities = results['df_combined'].loc[table.index, 'Entity'].astype(str).to_numpy()
+    rows = np.flatnonzero(np.isin(entities, list(changes.deltas))) + 1
+
+    # A new animation name per change set restarts the flash on rows that change again
+    animation = f'lb-changed-{changes.version}'
+    selectors = ', '.join(f'table.dataframe tbody tr:nth-child({row}) td' for row in rows)
+    css = [
+        f'@keyframes {animation} {{ from {{ background-color: #FFE58F; }} to {{ background-color: transparent; }} }}',
+        f'{selectors} {{ animation: {animation} 4s ease-out; }}',
+    ]
+
+    # Rank movement arrows, for the OPS score ranks the feed follows
+    if data_mode == 'Total':
+        for row in np.flatnonzero(np.isin(entities, list(changes.rank_changes))) + 1:
+            old, new = changes.rank_changes[entities[row - 1]]
+            if new is None:
+                continue
+            up = old is None or new < old
+            arrow = '▲' if up else '▼'
+            steps = '' if old is None else f' {abs(old - new)}'
+            css.append(f"table.dataframe tbody tr:nth-child({row}) td:first-child::after "
+                       f"{{ content: ' {arrow}{steps}'; color: {'green' if up else 'red'}; font-size: 60%; }}")
+    return '<style>\n' + '\n'.join(css) + '\n</style>'
+
+# Changes of the board since this session last displayed it, empty on its first run
+def session_changes(event_key):
+    feed = get_change_feed(event_key)
+    state_key = f'feed_version_{event_key}'
+    version = st.session_state.get(state_key, feed.version)
+    st.session_state[state_key] = feed.version
+    return feed.since(version)
+
+# Function to display the latest approvals above the table
+def display_approvals_ticker(event_key):
+    recent = get_change_feed(event_key).recent_approvals()
+    if not recent:
+        return
+    now = datetime.now().timestamp()
+    items = ' &nbsp;·&nbsp; '.join(
+        f"<strong>{escape(entity)}</strong> +{count:g} <span style='color: grey;'>"
+        f"({max(0, int((now - taken_at) // 60))} min ago)</span>"
+        for taken_at, entity, count in recent)
+    st.markdown(f"<div style='text-align: center; font-size: 18px;'>✅ Latest approvals: {items}</div>",
+                unsafe_allow_html=True)
+
+# Function to rank, rename and order the leaderboard table
+# Returns the table and the name of the first missing column, if any
+def leaderboard_table(df, data_mode):
     # Calculate ranks based on scores
-    df_with_ranks = display_score_ranks(df)
+    df_with_ranks = display_score_ranks(df, top_k=LEADERBOARD_TOP_K)
 
     # Rename the columns for better readability
-    df_with_ranks.rename(columns={
+    df_with_ranks = df_with_ranks.rename(columns={
         'Total': f'{data_mode} OPS Score',
         'Total_Approved': f'{data_mode} Approvals',
         'Total_Applied': f'{data_mode} Applications',
         'Total_MoUs': f'{data_mode} MoUs',
         # 'APL_to_APD': f'{data_mode} Applied to Approved Ratio %'
-    }, inplace=True)
-
-    # Ensure the Rank column is included and set as the index
-    df_with_ranks['Rank'] = range(1, len(df_with_ranks) + 1)
+    })
 
     # Specify the order of columns explicitly
     # Make sure that the columns listed here match your DataFrame
@@ -333,29 +801,53 @@ def display_leaderboard_table(df, data_mode):
     # Check if all specified columns exist in the DataFrame
     for col in columns_order:
         if col not in df_with_ranks.columns:
-            st.error(f"Column '{col}' not found in DataFrame.")
-            return  # Stop execution if a column is missing
+            return None, col
 
     # Reorder DataFrame to include the Rank column first
-    df_with_ranks = df_with_ranks[columns_order]
-
-    # Convert DataFrame to HTML, including the rank column as a standard column
-    html_table = df_with_ranks.to_html(
-        classes='dataframe', index=False, escape=False)
-
-    # Display the HTML table
-    st.markdown(html_table, unsafe_allow_html=True)
+    return df_with_ranks[columns_order], None
+
+# Hidden diagnostics panel, opened with ?diagnostics=1 (or ?diagnostics=<key> when
+# LEADERBOARD_DIAGNOSTICS_KEY is set)
+def diagnostics_requested():
+    value = st.query_params.get('diagnostics')
+    if value is None:
+        return False
+    return DIAGNOSTICS_KEY is None or value == DIAGNOSTICS_KEY
+
+# Function to display recent stage timings and the metrics exports
+def display_diagnostics_panel():
+    st.divider()
+    st.subheader('🛠️ Diagnostics')
+
+    recent = pd.DataFrame(list(diagnostics.records))
+    if recent.empty:
+        st.info('No stages recorded yet.')
+    else:
+        timed = recent[recent['ms'] > 0]
+        summary = timed.groupby('stage')['ms'].describe(percentiles=[0.5, 0.95])
+        st.dataframe(summary[['count', '50%', '95%', 'max']], use_container_width=True)
+        st.dataframe(recent.tail(50).iloc[::-1], use_container_width=True, hide_index=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button('Prometheus metrics', diagnostics.prometheus_text(),
+                           file_name='leaderboard_metrics.prom', mime='text/plain')
+    with col2:
+        st.download_button('Stage records (JSON lines)', diagnostics.jsonl_text(),
+                           file_name='leaderboard_stages.jsonl', mime='application/jsonl')
 
 def functional_image_rendering(function):
+    # Shown in a narrow column next to the select box
+    sizes = '(max-width: 640px) 100vw, 20vw'
     if (function == "oGV" or function == "iGV"):
         # Render GV image
-        st.image(gv_image_path)
+        display_image(gv_image_path, sizes=sizes)
     elif (function == "oGTa" or function == "iGTa"):
         # Render GTa image
-        st.image(gta_image_path)
+        display_image(gta_image_path, sizes=sizes)
     elif (function == "oGTe" or function == "iGTe"):
         # Render GTe image
-        st.image(gte_image_path)
+        display_image(gte_image_path, sizes=sizes)
 
 def functional_bar_charts_formatting(chart):
     chart.update_layout(
@@ -370,43 +862,53 @@ def functional_bar_charts_formatting(chart):
         yaxis_tickfont=dict(size=14, color="#31333F"),
         showlegend=False)
 
-def radio_button():
+# Function to get the start of the daily window: the last 8:00 PM before `now`
+def daily_window_start(now):
+    # Define 8:00 PM time object
+    eight_pm = time(20, 0, 0)  # 20:00 hours
+
+    start = now.replace(hour=eight_pm.hour, minute=0, second=0, microsecond=0)
+    # Before 8 PM: Show data from yesterday 8 PM to current time
+    if now.time() < eight_pm:
+        start -= timedelta(days=1)
+    return start
+
+# Start of the Daily window the page is showing now
+def current_daily_window_start():
+    return daily_window_start(datetime.now(pytz.timezone('Asia/Kolkata')))
+
+# Daily numbers can be shown once the snapshot history is kept
+def radio_button(daily_available=False):
 
     # Set the time zone to GMT+5:30 (Asia/Kolkata)
     tz = pytz.timezone('Asia/Kolkata')
 
     # Get the current time in GMT+5:30
     now = datetime.now(tz)
-     
-    # Define 8:00 PM time object
-    eight_pm = time(20, 0, 0)  # 20:00 hours
- 
-     # Check if current time is before or after 8:00 PM
-    if now.time() < eight_pm:
-        # Before 8 PM: Show data from yesterday 8 PM to current time
-        start_time = (now - timedelta(days=1)).strftime("%d-%m-%Y")
-    else:
-        # After 8 PM: Show data from today 8 PM to current time
-        start_time = now.strftime("%d-%m-%Y")
- 
+
+    # Before 8 PM the window starts yesterday, after 8 PM it starts today
+    start_time = daily_window_start(now).strftime("%d-%m-%Y")
     end_time = now.strftime("%d-%m-%Y")
-    
-    # data_type = st.radio(
-    #     "",
-    #     ["Total Numbers", "Daily Numbers"],
-    #     captions=[
-    #         # f'Showing Total Data From 11-03-2025 to {today_gmt_530}',
-    #         f'Showing Total Data From 27-04-2025 to Current Time',
-    #         f'Showing Data Between {start_time} : 8.00 PM -- {end_time} : Current Time'
-    #     ],
-    #     horizontal=True,
-    #     label_visibility="collapsed"
-    # )
-
-    # if data_type == "Total Numbers":
-    data_mode = "Total"
-    # elif data_type == "Daily Numbers":
-    #     data_mode = "Daily"
+
+    if not daily_available:
+        return "Total"
+
+    data_type = st.radio(
+        "Select the type of data you want to view",
+        ["Total Numbers", "Daily Numbers"],
+        captions=[
+            # f'Showing Total Data From 11-03-2025 to {today_gmt_530}',
+            f'Showing Total Data From 27-04-2025 to Current Time',
+            f'Showing Data Between {start_time} : 8.00 PM -- {end_time} : Current Time'
+        ],
+        horizontal=True,
+        label_visibility="collapsed"
+    )
+
+    if data_type == "Total Numbers":
+        data_mode = "Total"
+    elif data_type == "Daily Numbers":
+        data_mode = "Daily"
 
     return data_mode
 
@@ -437,73 +939,148 @@ nibm_entity_workspace_goodluck_banner = "https://lh3.googleusercontent.com/d/1IE
 ruhuna_entity_workspace_goodluck_banner = "https://lh3.googleusercontent.com/d/1_SU1BEdpLROzWU3e5vll5xcx2S9L9x8V"
 rajarata_entity_workspace_goodluck_banner = "https://lh3.googleusercontent.com/d/1MXd-6WiUbDgyoiy9UQGg5Or_mk7OrDnb"
 
-# Main Streamlit app
-def main():
-        
-    st.set_page_config(
-        layout="wide",
-        page_title="NLDS2025 Hackathon",
-        page_icon=mascot_image,
+# Function to show how old the numbers are once the source has not confirmed them for a while
+def display_data_age(event_key):
+    poller = get_sheet_poller(event_key)
+    if poller.confirmed_at is None:
+        return
+    age = datetime.now().timestamp() - poller.confirmed_at
+    confirmed = datetime.fromtimestamp(poller.confirmed_at, pytz.timezone('Asia/Kolkata'))
+    minutes = int(age // 60)
+    if poller.seeded and poller.last_checked is None and poller.last_error is None:
+        # Restored from disk, however old, while the first fetch of the live sheet runs
+        st.info(f"Showing the numbers saved at {confirmed:%H:%M} ({minutes} min ago) "
+                "while the live sheet is loaded.", icon='⏳')
+        return
+    # A restored board the live sheet has not confirmed is stale as soon as a fetch failed
+    if age < STALE_AFTER and not poller.seeded:
+        return
+    st.warning(f"Showing the numbers as of {confirmed:%H:%M} ({minutes} min ago), "
+               "the live sheet could not be reached since.", icon='⏳')
+
+# Every image the pages of all events can show
+def image_sources():
+    sources = [gv_image_path, gta_image_path, gte_image_path]
+    for event in get_events()[0].values():
+        sources += [event.title_image, event.mascot_image, *event.banners.values()]
+    return sources
+
+# Local WebP/PNG variants of the page images, None when static serving is off
+# (enable it with server.enableStaticServing, see .streamlit/config.toml)
+@st.cache_resource(show_spinner=False)
+def get_image_assets():
+    if not st.get_option('server.enableStaticServing'):
+        return None
+    assets = ImageAssetCache(STATIC_ASSET_DIR, ASSET_SOURCE_DIR)
+    assets.prepare_in_background(image_sources())
+    return assets
+
+# Function to show an image from the local static variants, or from its original URL until they are ready
+def display_image(source, sizes='100vw', full_width=False):
+    assets = get_image_assets()
+    asset = assets.get(source) if assets is not None else None
+    if asset is None:
+        st.image(source, use_column_width=full_width or None)
+        return
+    style = 'width: 100%;' if full_width else 'max-width: 100%;'
+    st.markdown(asset.html(sizes=sizes, style=style), unsafe_allow_html=True)
+
+# Page icon: the small local PNG of an image when it has been built, otherwise the image itself
+def page_icon(source):
+    assets = get_image_assets()
+    asset = assets.get(source) if assets is not None and source else None
+    return assets.favicon_path(asset) if asset is not None else source
+
+# Built-in event, configured by the constants above and the LEADERBOARD_* environment variables
+def default_event():
+    return EventConfig(
+        'nlds', 'NLDS2025 Hackathon', DATA_SOURCE or DEFAULT_SHEET_URL,
+        title_image=title_image_path,
+        mascot_image=mascot_image,
+        banners={
+            'nsbm': nsbm_entity_workspace_goodluck_banner,
+            'kandy': kandy_entity_workspace_goodluck_banner,
+            'ccxcn': ccxcn_entity_workspace_goodluck_banner,
+            'cs': cs_entity_workspace_goodluck_banner,
+            'usj': usj_entity_workspace_goodluck_banner,
+            'sliit': sliit_entity_workspace_goodluck_banner,
+            'nibm': nibm_entity_workspace_goodluck_banner,
+            'ruhuna': ruhuna_entity_workspace_goodluck_banner,
+            'rajarata': rajarata_entity_workspace_goodluck_banner,
+        },
+        snapshot_db=SNAPSHOT_DB,
+        scoring=SCORING_CONFIG,
+        refresh_seconds=REFRESH_INTERVAL,
+        cache_mb=DERIVED_CACHE_MB,
     )
-    
-    # col100, col101, col102 = st.columns([1, 18, 1])
-    # with col101:
-    st.image(title_image_path,use_column_width=True)
 
-    st.markdown(
-        "<hr style='border: 1px solid #000; width: 100%;'>",
-        unsafe_allow_html=True
-    )
-    
-    # col151 = st.columns(1)
-    # with col151:
-    #st.image(rajarata_entity_workspace_goodluck_banner, use_column_width=True)
+# Every event served by this process and the key of the one shown without ?event=
+# (no spinner: it is read before set_page_config)
+@st.cache_resource(show_spinner=False)
+def get_events():
+    if EVENTS_CONFIG is None:
+        event = default_event()
+        return {event.key: event}, event.key
+    # Events inherit the images and limits of the built-in event unless they set their own
+    defaults = {
+        'title_image': title_image_path,
+        'mascot_image': mascot_image,
+        'refresh_seconds': REFRESH_INTERVAL,
+        'cache_mb': DERIVED_CACHE_MB,
+    }
+    return load_events(EVENTS_CONFIG, defaults)
 
-    # st.markdown("<div style='text-align: left;'>"
-    #             f"<h4>Select the type of data you want to view</h4>"
-    #             "</div>",
-    #             unsafe_allow_html=True,)
-    data_mode = radio_button()
-    # Set interval to 5 minutes
-    st_autorefresh(interval=1 * 60 * 1000, key="data_refresh")
-    # URL to your Google Sheets data
-    # Datasource url / Google Sheets CSV
-    sheet_url = "https://docs.google.com/spreadsheets/d/e/2PACX-1vSid0QnQOYSzZBEtZHwGhzkgdFF7pcxHxs8evjsqZ9H4vspzUlAg8JcuRNNj56XZZtnIxwlasRxjYhg/pub?gid=2141420671&single=true&output=csv"
+def get_event(event_key):
+    return get_events()[0][event_key]
+
+# Function to pick the event from ?event=<key>, None if there is no such event
+def selected_event():
+    events, default_key = get_events()
+    return events.get(st.query_params.get('event', default_key))
+
+FOOTER_HTML = "<p style='text-align: center;'>Made with ❤️ by &lt;/Dev.Team&gt; of <strong>AIESEC in Sri Lanka</strong></p>"
+
+# Live part of the page: summary numbers and leaderboard table
+def display_live_leaderboard(event, data_mode):
+    # Instrument this run when the page was opened with ?diagnostics
+    show_diagnostics = diagnostics_requested()
+    diagnostics.set_enabled(show_diagnostics)
 
     # Load data using the cached function
-    data = load_data(sheet_url)
+    with diagnostics.stage('load'):
+        snapshot = load_data(event.key)
 
-    if data is not None:
+    if snapshot is not None:
+        display_data_age(event.key)
+        data = snapshot.data
         # Check if the 'Entity' column exists in the DataFrame
         if 'Entity' in data.columns:  
 
-            # calculation of leaderboard items
-            fig_applied, df_entity_applied_total = applied_bar_chart_and_data(data, data_mode)
-            fig_approved, df_entity_approved_total = approved_bar_chart_and_data(data, data_mode)
-            fig_sus, df_entity_mou_total = mou_bar_chart_and_data(data, data_mode)
-            fig_apltoapd, df_entity_apltoapd_total = applied_to_approved_ratio_bar_chart_and_data(df_entity_approved_total, df_entity_applied_total, data_mode)
-            df_ranks = total_points(data, data_mode)
+            # Derived results are shared across sessions and rebuilt only when the sheet changes
+            results = leaderboard_results(event, snapshot, data_mode)
+
+            # Entity workspace pages, opened with ?entity=<name>
+            entity_key = st.query_params.get('entity')
 
-        # Merge all datasets
-            df_combined = df_entity_applied_total.merge(
-                df_entity_approved_total, on='Entity').merge(
-                    df_entity_mou_total, on='Entity').merge(
-                        df_entity_apltoapd_total, on='Entity').merge(df_ranks, on='Entity')
+            if results is None:
+                st.info('Daily numbers will appear once a snapshot of the sheet from before '
+                        f"{current_daily_window_start().strftime('%d-%m-%Y %I:%M %p')} has been saved.")
+            elif entity_key is not None:
+                with diagnostics.stage('display'):
+                    display_entity_workspace(event, results, entity_key, data_mode)
+            else:
+                with diagnostics.stage('display'):
+                    # Display the summary numbers (total applications, total approvals, and conversion rate)
+                    display_summary_numbers(results['total_mou'], results['total_approved'], results['total_applied'], data_mode)
 
-            # Calculate total values
-            total_approved = df_entity_approved_total['Total_Approved'].sum()
-            total_applied = df_entity_applied_total['Total_Applied'].sum()
-            total_mou = df_entity_mou_total['Total_MoUs'].sum()
+                    st.divider()
 
-            # Display the summary numbers (total applications, total approvals, and conversion rate)
-            display_summary_numbers(total_mou, total_approved, total_applied, data_mode)
-     
-            st.divider()
+                    st.subheader(f'🔥{data_mode} Leaderboard')
 
-            st.subheader(f'🔥{data_mode} Leaderboard')
+                    display_approvals_ticker(event.key)
 
-            # Display the leaderboard table
-            display_leaderboard_table(df_combined, data_mode)
+                    # Display the leaderboard table
+                    display_leaderboard_table(results, data_mode, session_changes(event.key))
 
             # st.divider()
 
@@ -511,116 +1088,109 @@ def main():
 
             # # applied bar chart
             # # with col204:
-            # #     st.plotly_chart(fig_sus, use_container_width=True)
+            # #     st.plotly_chart(mou_bar_chart(results['df_entity_mou_total'], data_mode), use_container_width=True)
 
             # # approved bar chart
             # with col205:
-            #     st.plotly_chart(fig_applied, use_container_width=True)
+            #     st.plotly_chart(applied_bar_chart(results['df_entity_applied_total'], data_mode), use_container_width=True)
 
             # col206, col207 = st.columns([1, 1])
 
             # # applied to approved ratio bar chart
             # with col206:
-            #     st.plotly_chart(fig_approved, use_container_width=True)
+            #     st.plotly_chart(approved_bar_chart(results['df_entity_approved_total'], data_mode), use_container_width=True)
 
             # with col207:
-            #     st.plotly_chart(fig_apltoapd, use_container_width=True)
+            #     st.plotly_chart(applied_to_approved_ratio_bar_chart(results['df_entity_apltoapd_total'], data_mode), use_container_width=True)
 
             # ###############################################################################
 
-            # st.divider()
+            # Functional analysis, opened with ?view=functions
+            if st.query_params.get('view') == 'functions' and 'Function' in data.columns:
+                display_functional_analysis(entity_function_cube(event, snapshot), data_mode,
+                                            get_results_cache(event.key))
 
-            # col11, col12 = st.columns([9, 2])
-
-            # with col11:
-
-            #     st.subheader('Functional Analysis')
-            #     # Create a select box to choose the 'Function'
-            #     selected_function = st.selectbox(
-            #         'Select Function', data['Function'].unique())
-
-            # with col12:
-            #     functional_image_rendering(selected_function)
-            
-            # SU_counts = count_SUs_by_entity(data, selected_function, data_mode)
-            # fig_0 = px.bar(SU_counts, x='Entity', y='Count_SUs',
-            #                title=f'📩 {data_mode} Sign Ups by Entity for {selected_function} Function',
-            #                labels={'Entity': 'Entity', 'Count_SUs': 'Sign Ups'}, color='Entity')
-            
-            # functional_bar_charts_formatting(fig_0)
-
-            # # Get the count of 'Applied' related to each entity based on the selected function
-            # applied_counts = count_applied_by_entity(data, selected_function, data_mode)
-
-            # # Create a bar chart using Plotly Express
-            # fig_1 = px.bar(applied_counts, x='Entity', y='Count_Applied', 
-            #                title=f'🌍 {data_mode} Applications by Entity for {selected_function} Function', 
-            #                labels={'Entity': 'Entity', 'Count_Applied': 'Applications'}, color='Entity')
-            
-            # functional_bar_charts_formatting(fig_1)
-
-            # # Get the count of 'Approved' related to each entity based on the selected function
-            # approved_counts = count_approved_by_entity(data, selected_function, data_mode)
-
-            # # Create a bar chart using Plotly Express
-            # fig_2 = px.bar(approved_counts, x='Entity', y='Count_Approved', 
-            #                title=f'✅ {data_mode} Approvals by Entity for {selected_function} Function',
-            #                labels={'Entity': 'Entity', 'Count_Approved': 'Approvals'}, color='Entity')
-            
-            # functional_bar_charts_formatting(fig_2)
-
-            # applied_to_approved_percent = count_applied_to_approved_ratio(
-            #     data, selected_function, data_mode)
-
-            # # Create a bar chart using Plotly Express
-            # fig_3 = px.bar(applied_to_approved_percent, x='Entity', y='Applied_to_Approved_Ratio', 
-            #                title=f'📊 {data_mode} Applied to Approved Ratio by Entity for {selected_function} Function',
-            #                labels={'Entity': 'Entity', 'Applied_to_Approved_Ratio': 'Applied to Approved Ratio'}, color='Entity')
-
-            # functional_bar_charts_formatting(fig_3)
-        
-            # ###############################################################################
-            # if selected_function == "oGV" or selected_function == "oGTa" or selected_function == "oGTe":
-            #     # st.write("<br><br>", unsafe_allow_html=True)
-            #     col301, col302 = st.columns(2)
+            # Scoring what-if, opened with ?view=scoring
+            if st.query_params.get('view') == 'scoring' and 'Function' in data.columns and results is not None:
+                cube = entity_function_cube(event, snapshot)
+                if cube.has('Applied', data_mode):
+                    display_scoring_what_if(event, score_basis(event, snapshot, cube, data_mode), results, data_mode)
+                else:
+                    st.info(f'The scoring what-if needs the {data_mode} columns of the sheet.')
 
-            #     with col301:
-            #         st.plotly_chart(fig_0, use_container_width=True)
+        else:
+            st.error("The 'Entity' column does not exist in the loaded data.")
+    else:
+        st.error("Failed to load data.")
 
-            #     with col302:
-            #         st.plotly_chart(fig_1, use_container_width=True)
+    # Score and rank movement, opened with ?view=trends
+    if st.query_params.get('view') == 'trends':
+        display_trends(event)
 
-            #     col311, col312 = st.columns(2)
+    if show_diagnostics:
+        display_diagnostics_panel()
 
-            #     with col311:
-            #         st.plotly_chart(fig_2, use_container_width=True)
 
-            #     with col312:
-            #         st.plotly_chart(fig_3, use_container_width=True)
-            
-            # else:
-            #     col5, col6 = st.columns(2)
+# The live part as a Streamlit fragment, rerun on its own timer without re-sending the page
+live_leaderboard_fragment = st.fragment(run_every=LIVE_UPDATE_INTERVAL)(display_live_leaderboard)
 
-            #     with col5:
-            #         st.plotly_chart(fig_1, use_container_width=True)
+# Main Streamlit app
+def main():
 
-            #     with col6:
-            #         st.plotly_chart(fig_2, use_container_width=True)
+    if API_PORT is not None:
+        get_api_server(API_PORT)
 
-            #     col13, col14, col15 = st.columns([1, 2, 1])
+    # Several events can be served by one process, ?event=<key> selects the board
+    event = selected_event()
+    if event is None:
+        st.set_page_config(layout="wide")
+        events, _ = get_events()
+        st.error(f"Unknown event '{st.query_params.get('event')}'. Available events: {', '.join(events)}")
+        return
 
-            #     with col14:
-            #         st.plotly_chart(fig_3, use_container_width=True)
+    st.set_page_config(
+        layout="wide",
+        page_title=event.title,
+        page_icon=page_icon(event.mascot_image),
+    )
+    
+    # col100, col101, col102 = st.columns([1, 18, 1])
+    # with col101:
+    display_image(event.title_image, full_width=True)
 
-            # st.write("<br>", unsafe_allow_html=True)
-            st.divider()
+    st.markdown(
+        "<hr style='border: 1px solid #000; width: 100%;'>",
+        unsafe_allow_html=True
+    )
+    
+    # col151 = st.columns(1)
+    # with col151:
+    #st.image(rajarata_entity_workspace_goodluck_banner, use_column_width=True)
 
-            # st.write("<br><br>", unsafe_allow_html=True)
-            st.write("<p style='text-align: center;'>Made with ❤️ by &lt;/Dev.Team&gt; of <strong>AIESEC in Sri Lanka</strong></p>", unsafe_allow_html=True)
-        else:
-            st.error("The 'Entity' column does not exist in the loaded data.")
+    # st.markdown("<div style='text-align: left;'>"
+    #             f"<h4>Select the type of data you want to view</h4>"
+    #             "</div>",
+    #             unsafe_allow_html=True,)
+    # Raw record exports carry their own Daily numbers, sheets need the snapshot history
+    daily_available = event.snapshot_db is not None or get_sheet_poller(event.key).source.has_daily
+    data_mode = radio_button(daily_available=daily_available)
+
+    # Table styling is part of the static page, only the numbers are refreshed
+    display_leaderboard_css()
+
+    if LIVE_UPDATE_MODE == 'page':
+        # Rerun the whole script every LIVE_UPDATE_INTERVAL seconds
+        st_autorefresh(interval=LIVE_UPDATE_INTERVAL * 1000, key="data_refresh")
+        display_live_leaderboard(event, data_mode)
     else:
-        st.error("Failed to load data.")
+        # Rerun only the summary numbers and the leaderboard table
+        live_leaderboard_fragment(event, data_mode)
+
+    # st.write("<br>", unsafe_allow_html=True)
+    st.divider()
+
+    # st.write("<br><br>", unsafe_allow_html=True)
+    st.write(FOOTER_HTML, unsafe_allow_html=True)
 
 
 if __name__ == "__main__":
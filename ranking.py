@@ -0,0 +1,71 @@
+import numpy as np
+
+
+# Tie policies for rank_entities
+#   dense   - 1, 2, 2, 3: tied entities share a rank and the next rank follows on
+#   min     - 1, 2, 2, 4: tied entities share the best rank, the next ranks are skipped
+#   ordinal - 1, 2, 3, 4: every entity gets its own rank, ties keep their sheet order
+RANK_METHODS = ('dense', 'min', 'ordinal')
+
+# Rank shown for entities that have not scored yet
+UNRANKED = '-'
+
+# Medals prefixed to the entity name for the top three ranks
+MEDALS = ['🥇 ', '🥈 ', '🥉 ']
+
+
+# Positions of the rows ordered by descending score; with top_k only the best
+# top_k rows are selected (partition) and sorted, not the whole column
+def score_order(scores, top_k=None):
+    if top_k is not None and top_k < len(scores):
+        if top_k <= 0:
+            return np.empty(0, dtype=np.intp)
+        kth_score = -np.partition(-scores, top_k - 1)[top_k - 1]
+        above = np.flatnonzero(scores > kth_score)
+        # Ties on the cut-off score are taken in sheet order, as a full sort would
+        tied = np.flatnonzero(scores == kth_score)[:top_k - len(above)]
+        selected = np.concatenate([above, tied])
+        selected.sort()
+        return selected[np.argsort(-scores[selected], kind='stable')]
+    return np.argsort(-scores, kind='stable')
+
+# Ranks of scores that are already sorted in descending order
+def sorted_ranks(sorted_scores, method='min'):
+    if method not in RANK_METHODS:
+        raise ValueError(f"Unknown rank method '{method}', expected one of {', '.join(RANK_METHODS)}")
+
+    positions = np.arange(1, len(sorted_scores) + 1)
+    if method == 'ordinal':
+        return positions
+
+    # True at the first row of every run of tied scores
+    new_score = np.ones(len(sorted_scores), dtype=bool)
+    new_score[1:] = sorted_scores[1:] != sorted_scores[:-1]
+    if method == 'dense':
+        return np.cumsum(new_score)
+    return np.maximum.accumulate(np.where(new_score, positions, 0))
+
+# Sort entities by score and add Rank and medals, without any per-row Python.
+# Entities with a zero score are listed last with UNRANKED as their rank.
+def rank_entities(df, score_column='Total', method='min', top_k=None, unranked_zero=True):
+    scores = df[score_column].to_numpy(dtype='float64', na_value=0)
+
+    order = score_order(scores, top_k)
+    ranked = df.iloc[order].copy()
+    sorted_scores = scores[order]
+    ranks = sorted_ranks(sorted_scores, method)
+
+    is_ranked = sorted_scores != 0 if unranked_zero else np.ones(len(order), dtype=bool)
+
+    # Replace rank number with - if the score is 0
+    rank_column = ranks.astype(object)
+    rank_column[~is_ranked] = UNRANKED
+    ranked['Rank'] = rank_column
+
+    # Apply gold, silver, and bronze medals to the 'Entity' column
+    medal = np.select(
+        [is_ranked & (ranks == place) for place in range(1, len(MEDALS) + 1)],
+        MEDALS, default='').astype(object)
+    ranked['Entity'] = medal + ranked['Entity'].astype(str).to_numpy(dtype=object)
+
+    return ranked
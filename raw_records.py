@@ -0,0 +1,243 @@
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_sources import DataSource, SourceData, file_token, frame_digest
+from sheet_schema import DATA_MODES, SheetSchemaError, conform_frame, read_header
+
+
+# Rows parsed at a time; memory stays bounded by this and the number of Entity x Function pairs
+CHUNK_ROWS = int(os.environ.get('LEADERBOARD_RECORD_CHUNK_ROWS', 100_000))
+
+# Record types of the export (case-insensitive) and the sheet metric each one counts towards
+RECORD_TYPES = {
+    'applied': 'Applied',
+    'application': 'Applied',
+    'approved': 'Approved',
+    'approval': 'Approved',
+    'mou': 'MoUs',
+    'mous': 'MoUs',
+    'su': 'SUs',
+    'sus': 'SUs',
+    'sign up': 'SUs',
+    'signup': 'SUs',
+}
+
+# Metrics counted per Entity x Function, 'Total' being the OPS score
+RECORD_METRICS = ['Applied', 'Approved', 'MoUs', 'SUs', 'Total']
+
+# OPS points of one record of each type, used when the export has no Points column,
+# e.g. LEADERBOARD_RECORD_POINTS='{"Applied": 1, "Approved": 5, "MoUs": 3}'
+RECORD_POINTS = json.loads(os.environ.get('LEADERBOARD_RECORD_POINTS') or
+                           '{"Applied": 1, "Approved": 1, "MoUs": 1, "SUs": 0}')
+
+# Columns of the export; Function, Timestamp and Points are optional
+RECORD_COLUMNS = ['Entity', 'Function', 'Type', 'Timestamp', 'Points']
+REQUIRED_RECORD_COLUMNS = ['Entity', 'Type']
+
+# Timestamps ending in Z or a +05:30 style offset
+_UTC_OFFSET = r'(?:Z|[+-]\d\d:?\d\d)$'
+
+# Bytes read at a time when looking for the last complete line
+_TAIL_BLOCK = 64 * 1024
+
+
+# Read at most `remaining` bytes of `file`, so the CSV parser stops at the last complete line
+class _BoundedReader(io.RawIOBase):
+    def __init__(self, file, remaining):
+        self.file = file
+        self.remaining = remaining
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self.remaining)
+        if size <= 0:
+            return 0
+        data = self.file.read(size)
+        buffer[:len(data)] = data
+        self.remaining -= len(data)
+        return len(data)
+
+
+# Running per Entity x Function totals of the records read so far
+class RecordAccumulator:
+    def __init__(self, keys):
+        self.keys = keys
+        self.totals = None
+        self.daily = None
+
+    # Add one chunk of records; rows at or after `window_start` also count towards Daily
+    def add(self, chunk, window_start=None):
+        types = chunk['Type'].astype('category')
+        metric = types.map({value: RECORD_TYPES.get(str(value).strip().lower())
+                            for value in types.cat.categories})
+        known = metric.notna().to_numpy()
+        if not known.all():
+            # Unknown record types (e.g. rejections) do not count towards any metric
+            chunk, metric = chunk[known], metric[known]
+        if chunk.empty:
+            return
+
+        if 'Points' in chunk.columns:
+            points = pd.to_numeric(chunk['Points'], errors='coerce').fillna(0)
+        else:
+            points = metric.map(RECORD_POINTS).astype('float64').fillna(0)
+        records = chunk[self.keys].assign(metric=metric.astype(str), points=points.to_numpy())
+        self.totals = self._add(self.totals, self._sums(records))
+
+        if window_start is not None:
+            in_window = (self._timestamps(chunk, window_start) >= window_start).to_numpy()
+            if in_window.any():
+                self.daily = self._add(self.daily, self._sums(records[in_window]))
+
+    def reset_daily(self):
+        self.daily = None
+
+    # Counts per record type and the OPS score of one chunk, one row per Entity x Function
+    def _sums(self, records):
+        counts = records.groupby(self.keys + ['metric'], observed=True).size().unstack('metric', fill_value=0)
+        sums = counts.reindex(columns=RECORD_METRICS[:-1], fill_value=0).astype('float64')
+        sums['Total'] = records.groupby(self.keys, observed=True)['points'].sum()
+        return sums
+
+    @staticmethod
+    def _add(totals, sums):
+        if totals is None:
+            return sums
+        return totals.add(sums, fill_value=0)
+
+    # Record times in UTC; times without an offset are in the time zone of `window_start`
+    @staticmethod
+    def _timestamps(chunk, window_start):
+        if 'Timestamp' not in chunk.columns:
+            raise SheetSchemaError("Daily numbers need a 'Timestamp' column in the record export")
+        values = chunk['Timestamp'].astype(str).str.strip()
+        with_offset = values.str.contains(_UTC_OFFSET).to_numpy()
+        timestamps = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns, UTC]')
+        if with_offset.any():
+            timestamps[with_offset] = pd.to_datetime(values[with_offset], errors='coerce', utc=True)
+        if not with_offset.all():
+            local = pd.to_datetime(values[~with_offset], errors='coerce')
+            timestamps[~with_offset] = local.dt.tz_localize(
+                window_start.tzinfo, ambiguous='NaT', nonexistent='NaT').dt.tz_convert('UTC')
+        return timestamps
+
+    # The accumulated totals in the layout of the published sheet
+    def frame(self, with_daily):
+        columns = {}
+        modes = DATA_MODES if with_daily else ['Total']
+        index = self.totals.index if self.totals is not None else None
+        for mode in modes:
+            sums = self.totals if mode == 'Total' else self.daily
+            if index is None:
+                sums = pd.DataFrame(columns=RECORD_METRICS, dtype='float64')
+            elif sums is None:
+                sums = pd.DataFrame(0.0, index=index, columns=RECORD_METRICS)
+            else:
+                sums = sums.reindex(index, fill_value=0)
+            for metric in RECORD_METRICS:
+                columns[f'{mode} {metric}'] = sums[metric].to_numpy()
+            applied = sums['Applied'].to_numpy()
+            approved = sums['Approved'].to_numpy()
+            with np.errstate(divide='ignore', invalid='ignore'):
+                columns[f'{mode} %APL-APD'] = np.where(applied > 0, np.round(approved * 100 / applied, 2), 0)
+
+        labels = index.to_frame(index=False) if index is not None else pd.DataFrame(columns=self.keys)
+        return conform_frame(pd.concat([labels, pd.DataFrame(columns)], axis=1))
+
+
+# A raw event-level export (one row per application, approval, MoU or sign-up) that
+# grows by appends. Records are streamed in chunks into per Entity x Function totals,
+# and later fetches only read the lines appended since the last offset. The file is
+# read from the start again when it shrinks or its header changes.
+class RawRecordsSource(DataSource):
+    def __init__(self, path, day_start=None):
+        self.location = path
+        # Returns the start of the current Daily window, None for Total numbers only
+        self.day_start = day_start
+        self._header = None
+        self._reset(None)
+
+    # Daily numbers need a Timestamp column; exports without one only have Total numbers
+    @property
+    def has_daily(self):
+        if self.day_start is None:
+            return False
+        header = self._header
+        if header is None:
+            # Not fetched yet: look at the export's header line
+            try:
+                with open(self.location, 'rb') as f:
+                    header = read_header(f.readline())
+            except (OSError, ValueError):
+                return False
+        return 'Timestamp' in header
+
+    def _reset(self, header_line):
+        self._header_line = header_line
+        self._offset = len(header_line) if header_line is not None else 0
+        self._accumulator = None
+        self._window = None
+
+    def fetch(self, token=None):
+        stat_token = file_token(self.location)
+        window = self.day_start() if self.has_daily else None
+        if token is not None and token == (stat_token, window) and self._accumulator is not None:
+            return None
+
+        with open(self.location, 'rb') as f:
+            header_line = f.readline()
+            size = os.fstat(f.fileno()).st_size
+            if header_line != self._header_line or size < self._offset:
+                # New or rewritten file: start over
+                keys = self._keys(header_line)
+                self._reset(header_line)
+                self._accumulator = RecordAccumulator(keys)
+                window = self.day_start() if self.has_daily else None
+            if window != self._window:
+                # The Daily window moved on; records read before it started no longer count
+                self._accumulator.reset_daily()
+                self._window = window
+
+            end = self._last_line_end(f, size)
+            if end > self._offset:
+                f.seek(self._offset)
+                self._read_records(_BoundedReader(f, end - self._offset))
+                self._offset = end
+
+        data = self._accumulator.frame(self.has_daily)
+        return SourceData(data, frame_digest(data), (stat_token, window))
+
+    def _keys(self, header_line):
+        header = read_header(header_line)
+        missing = [col for col in REQUIRED_RECORD_COLUMNS if col not in header]
+        if missing:
+            raise SheetSchemaError(f"Missing columns in the record export: {', '.join(missing)}")
+        self._header = header
+        return [col for col in ('Entity', 'Function') if col in header]
+
+    def _read_records(self, reader):
+        columns = [col for col in RECORD_COLUMNS if col in self._header]
+        chunks = pd.read_csv(reader, header=None, names=self._header, usecols=columns,
+                             dtype={'Entity': 'category', 'Function': 'category', 'Type': 'category',
+                                    'Timestamp': str},
+                             chunksize=CHUNK_ROWS, engine='c')
+        for chunk in chunks:
+            self._accumulator.add(chunk, self._window)
+
+    # Offset just past the last newline, so a line still being written is left for the next fetch
+    def _last_line_end(self, f, size):
+        position = size
+        while position > self._offset:
+            start = max(self._offset, position - _TAIL_BLOCK)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b'\n')
+            if newline >= 0:
+                return start + newline + 1
+            position = start
+        return self._offset
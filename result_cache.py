@@ -0,0 +1,127 @@
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+# Estimated bytes held by a cached value: frames, arrays, text and the containers and
+# objects around them. Objects reachable twice are counted once.
+def estimate_size(value, seen=None):
+    if seen is None:
+        seen = set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True, index=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (str, bytes, bytearray, int, float, bool)) or value is None:
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k, seen) + estimate_size(v, seen) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_size(item, seen) for item in value)
+    if hasattr(value, 'to_plotly_json'):
+        # Plotly figures: the traces and layout they would serialize
+        return estimate_size(value.to_plotly_json(), seen)
+    if hasattr(value, '__dict__'):
+        return sys.getsizeof(value) + estimate_size(vars(value), seen)
+    return sys.getsizeof(value)
+
+
+# A value being computed by one get_or_compute() caller, for the others to wait on
+class _Pending:
+    def __init__(self):
+        self.done = threading.Event()
+        self.ok = False
+        self.value = None
+
+
+# Small thread-safe LRU used to memoize derived leaderboard results across sessions,
+# bounded by number of entries (`maxsize`) and/or estimated bytes (`maxbytes`).
+# Values are shared between sessions, so callers must treat them as read-only.
+class LRUCache:
+    def __init__(self, maxsize=None, maxbytes=None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.misses = 0
+        # Estimated bytes of the cached values, only tracked when `maxbytes` is set
+        self.nbytes = 0
+        self._items = OrderedDict()
+        self._sizes = {}
+        # Keys get_or_compute() is computing, so concurrent callers wait instead of repeating it
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        # Sized outside the lock, a large frame takes a while
+        size = estimate_size(value) if self.maxbytes is not None else 0
+        with self._lock:
+            self.nbytes += size - self._sizes.get(key, 0)
+            self._items[key] = value
+            self._sizes[key] = size
+            self._items.move_to_end(key)
+            # The newest entry is always kept, even when it alone exceeds the budget
+            while len(self._items) > 1 and self._over_budget():
+                old_key, _ = self._items.popitem(last=False)
+                self.nbytes -= self._sizes.pop(old_key)
+
+    def _over_budget(self):
+        return ((self.maxsize is not None and len(self._items) > self.maxsize) or
+                (self.maxbytes is not None and self.nbytes > self.maxbytes))
+
+    # Return the cached value for key, computing and storing it on a miss. Only one
+    # caller computes a missing key; the others wait for its value, and retry the
+    # computation themselves if it failed.
+    def get_or_compute(self, key, compute):
+        while True:
+            with self._lock:
+                if key in self._items:
+                    self.hits += 1
+                    self._items.move_to_end(key)
+                    return self._items[key]
+                pending = self._pending.get(key)
+                if pending is None:
+                    self.misses += 1
+                    pending = self._pending[key] = _Pending()
+                    break
+            pending.done.wait()
+            if pending.ok:
+                with self._lock:
+                    self.hits += 1
+                return pending.value
+
+        try:
+            pending.value = compute()
+            pending.ok = True
+            self.put(key, pending.value)
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.done.set()
+        return pending.value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._sizes.clear()
+            self.nbytes = 0
@@ -0,0 +1,117 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from ranking import score_order, sorted_ranks
+
+
+# Series kept per entity, in the order they are stored
+SERIES = ['Total', 'Total_Applied', 'Rank']
+
+
+# Indices of the points kept when downsampling (x, y) to `threshold` points with
+# Largest-Triangle-Three-Buckets; first and last points are always kept
+def lttb_indices(x, y, threshold):
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.intp)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third corner of the triangle
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        xs = x[start:end]
+        ys = y[start:end]
+        area = np.abs((x[a] - avg_x) * (ys - y[a]) - (x[a] - xs) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+    return indices
+
+
+# Fixed-size buffer of one entity's series. When it fills up, its points are
+# downsampled to half the capacity with LTTB on the score, so a long event keeps
+# its overall shape in bounded memory.
+class SeriesBuffer:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = np.empty(capacity, dtype='float64')
+        self.values = np.empty((len(SERIES), capacity), dtype='float64')
+        self.count = 0
+
+    def append(self, taken_at, values):
+        if self.count == self.capacity:
+            self._compact()
+        self.times[self.count] = taken_at
+        self.values[:, self.count] = values
+        self.count += 1
+
+    def _compact(self):
+        keep = lttb_indices(self.times, self.values[0], self.capacity // 2)
+        self.times[:len(keep)] = self.times[keep]
+        self.values[:, :len(keep)] = self.values[:, keep]
+        self.count = len(keep)
+
+    # The stored points, downsampled to at most max_points
+    def points(self, max_points):
+        times = self.times[:self.count]
+        values = self.values[:, :self.count]
+        keep = lttb_indices(times, values[0], max_points)
+        return times[keep], values[:, keep]
+
+
+# Per-entity OPS score, applications and rank over time, fed with every new snapshot
+class ScoreHistory:
+    def __init__(self, capacity=720):
+        self.capacity = capacity
+        self.version = 0
+        self._buffers = {}
+        self._lock = threading.Lock()
+
+    # Add a snapshot's combined per-entity frame (Entity, Total, Total_Applied)
+    def record(self, taken_at, metrics):
+        scores = metrics['Total'].to_numpy(dtype='float64', na_value=0)
+        order = score_order(scores)
+        ranks = np.empty(len(scores), dtype='float64')
+        ranks[order] = sorted_ranks(scores[order], 'min')
+        # Entities without a score are unranked
+        ranks[scores == 0] = np.nan
+
+        applied = metrics['Total_Applied'].to_numpy(dtype='float64', na_value=0)
+        with self._lock:
+            for entity, score, applications, rank in zip(metrics['Entity'].astype(str), scores, applied, ranks):
+                buffer = self._buffers.get(entity)
+                if buffer is None:
+                    buffer = self._buffers[entity] = SeriesBuffer(self.capacity)
+                buffer.append(taken_at, (score, applications, rank))
+            self.version += 1
+
+    # Long-format frame (time, Entity, Total, Total_Applied, Rank) with at most
+    # max_points points per entity, whatever the length of the event
+    def series(self, max_points=200):
+        frames = []
+        with self._lock:
+            for entity, buffer in self._buffers.items():
+                times, values = buffer.points(max_points)
+                frame = pd.DataFrame(dict(zip(SERIES, values)))
+                frame.insert(0, 'Entity', entity)
+                frame.insert(0, 'time', times)
+                frames.append(frame)
+        if not frames:
+            series = pd.DataFrame({'time': pd.Series(dtype='float64'), 'Entity': pd.Series(dtype=object)})
+            for name in SERIES:
+                series[name] = pd.Series(dtype='float64')
+        else:
+            series = pd.concat(frames, ignore_index=True)
+        series['time'] = pd.to_datetime(series['time'], unit='s', utc=True)
+        return series
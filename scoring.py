@@ -0,0 +1,143 @@
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+from data_sources import DataSource, SourceData
+from entity_cube import CUBE_METRICS
+from sheet_schema import DATA_MODES, FRACTIONAL_DTYPE
+
+
+# Base metrics the OPS score is computed from, in the order of the weight vectors
+SCORE_METRICS = ['Applied', 'Approved', 'MoUs', 'SUs']
+
+
+class ScoringConfigError(ValueError):
+    pass
+
+
+# Points per unit of every base metric, with optional per-function overrides:
+#   {"default": {"Applied": 1, "Approved": 5, "MoUs": 3},
+#    "functions": {"oGV": {"Approved": 8}, "iGTa": {"Applied": 2}}}
+# Metrics left out score no points.
+class ScoringWeights:
+    def __init__(self, default=None, functions=None, name='official'):
+        self.name = name
+        self.default = _metric_weights(default or {}, 'default')
+        self.functions = {str(function): _metric_weights(weights, function)
+                          for function, weights in (functions or {}).items()}
+
+    @classmethod
+    def from_dict(cls, config, name='official'):
+        if not isinstance(config, dict) or not set(config) <= {'default', 'functions'}:
+            raise ScoringConfigError("Scoring config must be an object with 'default' and 'functions'")
+        return cls(config.get('default'), config.get('functions'), name)
+
+    # One row of points per function and one column per SCORE_METRICS entry, as edited in the app
+    @classmethod
+    def from_frame(cls, frame, name='what-if'):
+        functions = {str(function): {metric: float(row[metric]) for metric in SCORE_METRICS if metric in row}
+                     for function, row in frame.fillna(0).iterrows()}
+        return cls(functions=functions, name=name)
+
+    def weights_for(self, function):
+        weights = dict.fromkeys(SCORE_METRICS, 0.0)
+        weights.update(self.default)
+        weights.update(self.functions.get(str(function), {}))
+        return [weights[metric] for metric in SCORE_METRICS]
+
+    # Function x metric array of points
+    def matrix(self, functions):
+        return np.array([self.weights_for(function) for function in functions], dtype='float64').reshape(
+            len(functions), len(SCORE_METRICS))
+
+    def to_frame(self, functions):
+        return pd.DataFrame(self.matrix(functions), index=pd.Index(functions, name='Function'),
+                            columns=SCORE_METRICS)
+
+    # Identifies the weights, so scores computed with other weights never share a digest
+    @property
+    def digest(self):
+        config = json.dumps({'default': self.default, 'functions': self.functions}, sort_keys=True)
+        return hashlib.blake2b(config.encode(), digest_size=16).hexdigest()
+
+
+def _metric_weights(weights, owner):
+    unknown = set(weights) - set(SCORE_METRICS)
+    if unknown:
+        raise ScoringConfigError(f"Unknown metrics for {owner}: {', '.join(sorted(unknown))}, "
+                                 f"expected {', '.join(SCORE_METRICS)}")
+    return {metric: float(points) for metric, points in weights.items()}
+
+# Scoring weights from a JSON file path, or from the parsed config itself
+def load_scoring(spec):
+    if isinstance(spec, str):
+        with open(spec, encoding='utf-8') as f:
+            spec = json.load(f)
+    return ScoringWeights.from_dict(spec)
+
+
+# Replace the '{mode} Total' columns of a sheet frame with the score from `weights`,
+# row by row, so every per-entity and per-function sum is the weighted sum of its metrics
+def apply_scoring(df, weights):
+    df = df.copy()
+    if 'Function' in df.columns:
+        codes, functions = pd.factorize(df['Function'])
+        matrix = weights.matrix(list(functions))
+        # Rows without a function (code -1) pick the last row, the default weights
+        matrix = np.vstack([matrix, weights.matrix([None])])
+        row_weights = matrix[codes]
+    else:
+        row_weights = np.broadcast_to(weights.matrix([None]), (len(df), len(SCORE_METRICS)))
+
+    for mode in DATA_MODES:
+        columns = [f'{mode} {metric}' for metric in SCORE_METRICS]
+        if not any(col in df.columns for col in columns):
+            continue
+        values = np.column_stack([
+            df[col].to_numpy(dtype='float64', na_value=0) if col in df.columns else np.zeros(len(df))
+            for col in columns])
+        total = np.einsum('rm,rm->r', values, row_weights)
+        # Whole scores keep the sheet's Int32 dtype
+        df[f'{mode} Total'] = pd.array(total, dtype='Int32' if (total % 1 == 0).all() else FRACTIONAL_DTYPE)
+    return df
+
+
+# A data source whose OPS scores are computed in the app from the base metrics,
+# instead of being read from the sheet's Total columns
+class ScoredSource(DataSource):
+    def __init__(self, source, weights):
+        self.source = source
+        self.weights = weights
+        self.location = source.location
+
+    @property
+    def has_daily(self):
+        return self.source.has_daily
+
+    def fetch(self, token=None):
+        weights_digest, source_token = token or (None, None)
+        if weights_digest != self.weights.digest:
+            # Scored with other weights (e.g. restored from before a config change): score again
+            source_token = None
+        fetched = self.source.fetch(source_token)
+        if fetched is None:
+            return None
+        digest = hashlib.sha256(f'{fetched.digest}:{self.weights.digest}'.encode()).hexdigest()
+        return SourceData(apply_scoring(fetched.data, self.weights), digest, (self.weights.digest, fetched.token))
+
+
+# Per-entity base metric sums of one data mode, laid out as an Entity x (Function, metric)
+# matrix, so the scores of any weighting are one matrix-vector product
+class ScoreBasis:
+    def __init__(self, cube, data_mode):
+        planes = cube.values[:, :, [CUBE_METRICS.index(metric) for metric in SCORE_METRICS],
+                             DATA_MODES.index(data_mode)]
+        self.entities = cube.entities
+        self.functions = list(cube.functions)
+        # Metrics the sheet does not have count as zero
+        self.matrix = np.ascontiguousarray(np.nan_to_num(planes).reshape(len(cube.entities), -1))
+
+    def scores(self, weights):
+        return pd.Series(self.matrix @ weights.matrix(self.functions).ravel(), index=self.entities)
@@ -0,0 +1,212 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import diagnostics
+from data_sources import FETCH_TIMEOUT
+
+
+# Numpy buffers behind the columns of a frame: plain arrays, the values and masks of
+# nullable (Int32) columns and the codes of categoricals. pandas has no public way to
+# reach them, so this walks the arrays of the frame's block manager.
+def _buffers(df):
+    for values in df._mgr.arrays:
+        if isinstance(values, np.ndarray):
+            yield values
+            continue
+        if isinstance(values, pd.arrays.ArrowExtensionArray):
+            # Arrow memory is immutable already
+            continue
+        for name in ('_ndarray', '_data', '_mask'):
+            buffer = getattr(values, name, None)
+            if isinstance(buffer, np.ndarray):
+                yield buffer
+
+# Make every buffer of `df` read-only; writing into it raises instead of changing it
+def freeze_frame(df):
+    for buffer in _buffers(df):
+        buffer.flags.writeable = False
+    _check_frozen(df)
+    return df
+
+# Write one value back into every column and expect it to fail, so a pandas upgrade that
+# renames the internals _buffers() relies on breaks loudly instead of leaving the shared
+# frame writable
+def _check_frozen(df):
+    for position, col in enumerate(df.columns):
+        values = df.iloc[:, position].array
+        if len(values) == 0 or isinstance(values, pd.arrays.ArrowExtensionArray):
+            continue
+        try:
+            values[0] = values[0]
+        except ValueError:
+            continue
+        raise RuntimeError(f"Column {col!r} of the snapshot is still writable after freeze_frame(); "
+                           "pandas internals changed, update sheet_poller._buffers()")
+
+
+# One version of the leaderboard data, tagged with a digest of its contents.
+# The frame is read-only and shared by reference with every session of the process,
+# so sessions read it without locking or copying, and derived frames copy on write.
+class SheetSnapshot:
+    def __init__(self, data, digest, token=None, fetched_at=None):
+        self.data = freeze_frame(data)
+        self.digest = digest
+        self.token = token
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+
+
+# Background poller that keeps the latest snapshot of a data source in memory.
+# One poller runs per data source per server process; sessions only ever read
+# `latest()` and never wait on the source once the first fetch has finished.
+class SheetPoller:
+    def __init__(self, source, interval, name='sheet'):
+        self.source = source
+        self.interval = interval
+        self.name = name
+        self.last_error = None
+        self.last_checked = None
+        # When the source last confirmed the current snapshot (new data or "unchanged")
+        self.confirmed_at = None
+        # The current snapshot was restored with seed() and no fetch has succeeded since
+        self.seeded = False
+        self._snapshot = None
+        self._fetch_lock = threading.Lock()
+        self._first_fetch = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = False
+        self._listeners = []
+
+    # Call `listener(snapshot)` on the poller thread whenever a new snapshot is published
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    # Poll on the shared `scheduler` when given, otherwise on a thread of its own
+    def start(self, scheduler=None):
+        if not self._started:
+            self._started = True
+            if scheduler is not None:
+                scheduler.add(self)
+            else:
+                self._thread = threading.Thread(
+                    target=self._run, name=f'{self.name}-poller', daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.interval)
+
+    # Serve `snapshot` (e.g. restored from disk) until the first fetch replaces or confirms it
+    def seed(self, snapshot):
+        if self._snapshot is None:
+            self._snapshot = snapshot
+            self.confirmed_at = snapshot.fetched_at
+            self.seeded = True
+            self._first_fetch.set()
+
+    # Return the latest snapshot; only blocks (up to `timeout`) before the very first fetch
+    def latest(self, timeout=FETCH_TIMEOUT):
+        if self._snapshot is None:
+            self._first_fetch.wait(timeout)
+        return self._snapshot
+
+    # Fetch from the source now. Concurrent callers are coalesced onto the fetch
+    # already in flight instead of issuing their own request.
+    def refresh(self):
+        if not self._fetch_lock.acquire(blocking=False):
+            with self._fetch_lock:
+                return self._snapshot
+        start = time.perf_counter()
+        snapshot = None
+        try:
+            snapshot = self._fetch()
+            if snapshot is not None:
+                # Publishing is a single reference swap, readers see either snapshot whole
+                self._snapshot = snapshot
+                for listener in self._listeners:
+                    listener(snapshot)
+            self.last_error = None
+            self.confirmed_at = time.time()
+            self.seeded = False
+        except Exception as e:
+            self.last_error = e
+        finally:
+            # Once per interval, so fetches are always recorded
+            diagnostics.record('fetch', time.perf_counter() - start,
+                               source=self.name, changed=snapshot is not None, error=self.last_error is not None)
+            self.last_checked = time.time()
+            self._first_fetch.set()
+            self._fetch_lock.release()
+        return self._snapshot
+
+    # Returns None when the source reports that nothing has changed
+    def _fetch(self):
+        current = self._snapshot
+        fetched = self.source.fetch(current.token if current is not None else None)
+        if fetched is None:
+            return None
+        if current is not None and current.digest == fetched.digest:
+            # New token, same contents: keep the snapshot (and its derived results)
+            self._snapshot = SheetSnapshot(current.data, current.digest, fetched.token)
+            return None
+        return SheetSnapshot(fetched.data, fetched.digest, fetched.token)
+
+
+# Runs the refreshes of every poller in the process on one small pool of worker
+# threads. Each poller keeps its own interval and is only scheduled again once
+# its previous fetch has finished, so a slow source holds at most one worker and
+# never delays the other boards.
+class RefreshScheduler:
+    def __init__(self, workers=4):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sheet-refresh')
+        self._due = []
+        self._order = itertools.count()
+        self._wakeup = threading.Condition()
+        self._thread = None
+
+    # Refresh `poller` now and then every `poller.interval` seconds until it is stopped
+    def add(self, poller):
+        with self._wakeup:
+            self._schedule(poller, 0)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='refresh-scheduler', daemon=True)
+                self._thread.start()
+
+    def _schedule(self, poller, delay):
+        heapq.heappush(self._due, (time.monotonic() + delay, next(self._order), poller))
+        self._wakeup.notify()
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                while not self._due or self._due[0][0] > time.monotonic():
+                    self._wakeup.wait(self._due[0][0] - time.monotonic() if self._due else None)
+                _, _, poller = heapq.heappop(self._due)
+            if not poller.stopped:
+                try:
+                    self._pool.submit(self._refresh, poller)
+                except RuntimeError:
+                    # The pool is shut down when the interpreter exits
+                    return
+
+    def _refresh(self, poller):
+        try:
+            poller.refresh()
+        finally:
+            with self._wakeup:
+                self._schedule(poller, poller.interval)
@@ -0,0 +1,105 @@
+import csv
+import io
+import os
+
+import pandas as pd
+
+
+# Data modes and per-entity metric columns of the leaderboard sheet ('{data_mode} {metric}')
+DATA_MODES = ['Total', 'Daily']
+
+# Compact dtypes of the metric columns; counts are nullable so blank cells stay integers
+METRIC_DTYPES = {
+    'Applied': 'Int32',
+    'Approved': 'Int32',
+    'MoUs': 'Int32',
+    'SUs': 'Int32',
+    'Total': 'Int32',
+    '%APL-APD': 'float32',
+}
+
+# Count and score columns holding fractions; float64, so a score of 12.1 is shown as 12.1
+FRACTIONAL_DTYPE = 'float64'
+
+# Label columns, repeated on every row, so stored once per distinct value
+LABEL_DTYPES = {
+    'Entity': 'category',
+    'Function': 'category',
+}
+
+# Columns the leaderboard cannot be built without
+REQUIRED_COLUMNS = ['Entity'] + [f'Total {metric}' for metric in ('Applied', 'Approved', 'MoUs', 'Total')]
+
+# CSV parser: 'pyarrow' (multi-threaded) when installed, otherwise pandas' 'c' engine
+CSV_ENGINE = os.environ.get('LEADERBOARD_CSV_ENGINE', 'pyarrow')
+
+
+class SheetSchemaError(ValueError):
+    pass
+
+
+# Every column the leaderboard reads, with its declared dtype
+def sheet_dtypes():
+    dtypes = dict(LABEL_DTYPES)
+    for mode in DATA_MODES:
+        for metric, dtype in METRIC_DTYPES.items():
+            dtypes[f'{mode} {metric}'] = dtype
+    return dtypes
+
+# Header row of the CSV, read without parsing the rest of the file
+def read_header(raw):
+    first_line = raw.split(b'\n', 1)[0].decode('utf-8-sig')
+    return next(csv.reader([first_line]), [])
+
+# Check the header against the schema in one pass; returns the known columns present
+def validate_columns(header):
+    missing = [col for col in REQUIRED_COLUMNS if col not in header]
+    if missing:
+        raise SheetSchemaError(f"Missing columns in the sheet: {', '.join(missing)}")
+    return [col for col in sheet_dtypes() if col in header]
+
+def parser_engine():
+    if CSV_ENGINE == 'pyarrow':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return 'c'
+    return CSV_ENGINE
+
+# Bring columns that could not be parsed with their declared dtype into shape,
+# e.g. '12%' ratios or fractional scores
+def coerce_columns(df, dtypes):
+    for col, dtype in dtypes.items():
+        if dtype == 'category':
+            df[col] = df[col].astype('category')
+            continue
+        values = df[col]
+        if values.dtype == object:
+            values = values.str.rstrip('%').str.replace(',', '', regex=False)
+        values = pd.to_numeric(values, errors='coerce')
+        if dtype == 'Int32' and (values.dropna() % 1 != 0).any():
+            # Keep fractions rather than truncating them
+            dtype = FRACTIONAL_DTYPE
+        df[col] = values.astype(dtype)
+    return df
+
+# Parse the published sheet: only known columns, compact dtypes, validated up front
+def read_sheet_csv(raw):
+    columns = validate_columns(read_header(raw))
+    dtypes = {col: dtype for col, dtype in sheet_dtypes().items() if col in columns}
+    try:
+        return pd.read_csv(io.BytesIO(raw), usecols=columns, dtype=dtypes, engine=parser_engine())
+    except Exception:
+        # A cell that does not fit its declared dtype; parse as text and convert
+        df = pd.read_csv(io.BytesIO(raw), usecols=columns, dtype=str, engine='c')
+        return coerce_columns(df, dtypes)
+
+# Apply the schema to a frame loaded from a non-CSV source (Parquet, Arrow, SQLite)
+def conform_frame(df):
+    columns = validate_columns(list(df.columns))
+    dtypes = {col: dtype for col, dtype in sheet_dtypes().items() if col in columns}
+    df = df[columns]
+    try:
+        return df.astype(dtypes)
+    except (TypeError, ValueError):
+        return coerce_columns(df.copy(), dtypes)
@@ -0,0 +1,148 @@
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from result_cache import LRUCache
+
+
+# Per-entity totals saved with every snapshot, and their SQL column names
+STORE_METRICS = {
+    'Total_Applied': 'applied',
+    'Total_Approved': 'approved',
+    'Total_MoUs': 'mous',
+    'Total_SUs': 'sus',
+    'Total': 'total',
+}
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    taken_at REAL NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_taken_at ON snapshots (taken_at);
+CREATE TABLE IF NOT EXISTS entity_totals (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (id),
+    position INTEGER NOT NULL,
+    entity TEXT NOT NULL,
+    applied REAL, approved REAL, mous REAL, sus REAL, total REAL,
+    PRIMARY KEY (snapshot_id, position)
+) WITHOUT ROWID;
+'''
+
+
+# Difference between two stored snapshots, with the ids it was computed from
+class SnapshotWindow:
+    def __init__(self, metrics, start_id, end_id):
+        self.metrics = metrics
+        self.start_id = start_id
+        self.end_id = end_id
+
+
+# Append-only history of distinct sheet snapshots and their per-entity totals.
+# Any window ("today since 8 PM", "last hour", "since the start") is the latest
+# totals minus the totals of the last snapshot before the window, both looked up
+# through the taken_at index and kept in a small cache of vectors. The snapshot ids
+# of a window are answered from memory until the next append, so callers can key
+# their results on them and only compute the difference on a miss.
+class SnapshotStore:
+    def __init__(self, path, cache_size=16):
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._vectors = LRUCache(cache_size)
+        # snapshot_before() answers by timestamp, until the next append
+        self._before = {}
+        self._latest = self._query_one('SELECT id, digest FROM snapshots ORDER BY taken_at DESC, id DESC LIMIT 1')
+
+    def _query_one(self, sql, params=()):
+        with self._lock:
+            return self._connection.execute(sql, params).fetchone()
+
+    # Save the per-entity totals (indexed by Entity, STORE_METRICS columns) of a new
+    # snapshot; a snapshot with the same digest as the latest one is not stored again
+    def append(self, digest, totals, taken_at=None):
+        if self._latest is not None and self._latest[1] == digest:
+            return self._latest[0]
+        taken_at = time.time() if taken_at is None else taken_at
+        totals = totals.reindex(columns=list(STORE_METRICS)).astype('float64').fillna(0)
+
+        rows = [(position, str(entity), *values)
+                for position, (entity, values) in enumerate(zip(totals.index, totals.itertuples(index=False)))]
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                'INSERT INTO snapshots (taken_at, digest) VALUES (?, ?)', (taken_at, digest))
+            snapshot_id = cursor.lastrowid
+            self._connection.executemany(
+                'INSERT INTO entity_totals (snapshot_id, position, entity, applied, approved, mous, sus, total) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [(snapshot_id, *row) for row in rows])
+
+        vector = totals.copy()
+        vector.index = vector.index.astype(str)
+        vector.index.name = 'Entity'
+        self._vectors.put(snapshot_id, vector)
+        self._latest = (snapshot_id, digest)
+        self._before = {}
+        return snapshot_id
+
+    def latest_id(self):
+        return self._latest[0] if self._latest is not None else None
+
+    # Id of the last snapshot taken at or before `timestamp`, None if there is none
+    def snapshot_before(self, timestamp):
+        before = self._before
+        if timestamp not in before:
+            row = self._query_one(
+                'SELECT id FROM snapshots WHERE taken_at <= ? ORDER BY taken_at DESC, id DESC LIMIT 1', (timestamp,))
+            before[timestamp] = row[0] if row is not None else None
+        return before[timestamp]
+
+    # (id, taken_at) of every stored snapshot, oldest first
+    def snapshots(self):
+        with self._lock:
+            return self._connection.execute('SELECT id, taken_at FROM snapshots ORDER BY taken_at, id').fetchall()
+
+    def taken_at(self, snapshot_id):
+        row = self._query_one('SELECT taken_at FROM snapshots WHERE id = ?', (snapshot_id,))
+        return row[0] if row is not None else None
+
+    # Per-entity totals of one snapshot, indexed by Entity in sheet order
+    def vector(self, snapshot_id):
+        vector = self._vectors.get(snapshot_id)
+        if vector is None:
+            columns = ', '.join(STORE_METRICS.values())
+            with self._lock:
+                rows = self._connection.execute(
+                    f'SELECT entity, {columns} FROM entity_totals WHERE snapshot_id = ? ORDER BY position',
+                    (snapshot_id,)).fetchall()
+            vector = pd.DataFrame(rows, columns=['Entity'] + list(STORE_METRICS)).set_index('Entity')
+            self._vectors.put(snapshot_id, vector)
+        return vector
+
+    # (start id, end id) of the snapshots a window between `start` and `end` (default: latest
+    # snapshot) is computed from, without touching the database while nothing was appended.
+    # None until a snapshot from before `start` exists, since without one the change since
+    # `start` is unknown.
+    def window_ids(self, start, end=None):
+        end_id = self.latest_id() if end is None else self.snapshot_before(end)
+        start_id = self.snapshot_before(start)
+        if end_id is None or start_id is None:
+            return None
+        return start_id, end_id
+
+    # Change in every entity's totals between two snapshots. Entities that did not exist
+    # in the start snapshot count from zero.
+    def window_between(self, start_id, end_id):
+        current = self.vector(end_id)
+        base = self.vector(start_id)
+        delta = current.sub(base.reindex(current.index), fill_value=0)
+        return SnapshotWindow(delta.reset_index(), start_id, end_id)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,109 @@
+import hashlib
+from functools import lru_cache
+from html import escape
+
+from pandas.api.extensions import ExtensionDtype
+from pandas.api.types import is_float_dtype, is_numeric_dtype
+# The float formatting of DataFrame.to_html; pandas does not export it publicly
+from pandas.io.formats.format import format_array
+
+
+# Custom CSS for the leaderboard table, sent once per page rather than with every table
+LEADERBOARD_TABLE_CSS = """
+    <style>
+    th, td {
+        font-size: 20px !important;
+        padding: 10px; /* Add padding for better spacing */
+        text-align: center; /* Center-align text */
+        font-weight: 900;
+    }
+    table {
+        width: 100%; /* Full width */
+        border-collapse: collapse; /* Collapse borders */
+    }
+    th {
+        background-color: #FCFCFC; /* Light gray background for headers */
+        border: 5px solid #ddd; /* Add borders to header */
+    }
+    td {
+        border: 1px solid #ddd; /* Add borders to cells */
+    }
+    thead th {
+        background-color: green !important; /* Set the first row's background color to green */
+        color: white !important; /* Optional: Set text color to white for contrast */
+    }
+
+    /* Add media queries for responsiveness */
+    @media screen and (max-width: 768px) {
+        th, td {
+            font-size: 16px !important; /* Reduce font size for small screens */
+            padding: 8px; /* Adjust padding for small screens */
+        }
+    }
+
+    @media screen and (max-width: 480px) {
+        th, td {
+            font-size: 11px !important; /* Further reduce font size for very small screens */
+            padding: 6px; /* Further adjust padding */
+        }
+    }
+</style>
+"""
+
+
+# Row template for a table with n_columns columns, built once per column count
+@lru_cache(maxsize=None)
+def _row_template(n_columns):
+    return '    <tr>\n' + '      <td>{}</td>\n' * n_columns + '    </tr>\n'
+
+# Header and opening of the table, laid out like DataFrame.to_html(classes='dataframe')
+def _table_head(columns):
+    header = ''.join(f'      <th>{escape(str(col))}</th>\n' for col in columns)
+    return (
+        '<table border="1" class="dataframe">\n'
+        '  <thead>\n'
+        '    <tr style="text-align: right;">\n'
+        f'{header}'
+        '    </tr>\n'
+        '  </thead>\n'
+        '  <tbody>\n'
+    )
+
+# Cell text of one column. Floats are formatted column-wide like DataFrame.to_html does;
+# whole numbers without missing values need no escaping.
+def _column_cells(series):
+    if is_float_dtype(series.dtype):
+        values = series.array if isinstance(series.dtype, ExtensionDtype) else series.to_numpy()
+        return [escape(cell.strip()) for cell in format_array(values, None, leading_space=False)]
+    values = series.tolist()
+    if is_numeric_dtype(series.dtype) and not series.hasnans:
+        return map(str, values)
+    return [escape(str(value)) for value in values]
+
+# Digest of the table contents, used as the render cache key
+def table_digest(df):
+    digest = hashlib.blake2b(digest_size=16)
+    for col in df.columns:
+        values = df[col].to_numpy()
+        digest.update(f'\x1e{col}\x1f{values.dtype}\x1f'.encode())
+        if values.dtype != object:
+            digest.update(values.tobytes())
+        else:
+            # Object arrays hold pointers, hash their text instead
+            digest.update('\x1f'.join(map(str, values.tolist())).encode())
+    return digest.hexdigest()
+
+# Render the ranked table without going through DataFrame.to_html
+def build_leaderboard_html(df):
+    template = _row_template(len(df.columns))
+    cells = [_column_cells(df[col]) for col in df.columns]
+    rows = ''.join(map(template.format, *cells))
+    return _table_head(df.columns) + rows + '  </tbody>\n</table>'
+
+# Render the ranked table, reusing the HTML in `cache` (the event's results cache)
+# when its contents have not changed
+def render_leaderboard_html(df, data_mode, cache=None):
+    if cache is None:
+        return build_leaderboard_html(df)
+    return cache.get_or_compute(
+        ('html', table_digest(df), data_mode), lambda: build_leaderboard_html(df))
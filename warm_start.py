@@ -0,0 +1,56 @@
+import os
+import pickle
+
+from file_utils import atomic_write
+from sheet_poller import SheetSnapshot
+
+
+# Layout of the saved file; files written with another version are ignored
+FORMAT_VERSION = 2
+
+
+# Snapshot and derived results read back from disk
+class SavedState:
+    def __init__(self, snapshot, results):
+        self.snapshot = snapshot
+        # Derived results by their results cache key
+        self.results = results
+
+
+# The last good snapshot of one event and its derived results, saved on every change
+# so a restarted process serves the board at once instead of waiting on the sheet.
+# The file is written by this process only, so it is read back with pickle, which
+# keeps the frames' compact dtypes as they are.
+class WarmStartStore:
+    def __init__(self, path):
+        self.path = path
+
+    def save(self, snapshot, results):
+        state = {
+            'version': FORMAT_VERSION,
+            'data': snapshot.data,
+            'digest': snapshot.digest,
+            'token': snapshot.token,
+            'fetched_at': snapshot.fetched_at,
+            'results': {result['key']: result for result in results},
+        }
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        # A crash mid-write leaves the old file
+        with atomic_write(self.path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    # The saved state, None if there is none or it cannot be read
+    def load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                state = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Truncated or written by an incompatible version of pandas; the next fetch replaces it
+            return None
+        if not isinstance(state, dict) or state.get('version') != FORMAT_VERSION:
+            return None
+
+        snapshot = SheetSnapshot(state['data'], state['digest'], state['token'], fetched_at=state['fetched_at'])
+        return SavedState(snapshot, state['results'])